@@ -0,0 +1,81 @@
+import argparse
+from collections import defaultdict, Counter
+
+from games.game_log import GameLogReader
+
+
+def analyze(reader):
+    # for each pair of players (sorted by name): number of games, and the total score of each player
+    pair_games = Counter()
+    pair_scores = defaultdict(lambda: defaultdict(float))
+
+    # for each seat: the total score
+    seat_scores = defaultdict(float)
+    seat_games = Counter()
+
+    lengths = Counter()
+
+    for game in reader:
+        pair = tuple(sorted(game.players))
+        pair_games[pair] += 1
+        for seat, (name, score) in enumerate(zip(game.players, game.scores)):
+            pair_scores[pair][name] += score
+            seat_scores[seat] += score
+            seat_games[seat] += 1
+        lengths[game.num_actions] += 1
+
+    return pair_games, pair_scores, seat_scores, seat_games, lengths
+
+def print_pair_scores(pair_games, pair_scores):
+    print("\nScores per pair:")
+    for pair in sorted(pair_games):
+        num_games = pair_games[pair]
+        scores = " | ".join(f"{name}: {pair_scores[pair][name]:g} ({pair_scores[pair][name] / num_games:+.4f}/game)"
+                            for name in pair)
+        print(f"{' VS '.join(pair)} | {num_games} games | {scores}")
+
+def print_seat_scores(seat_scores, seat_games):
+    print("\nAverage score per seat:")
+    for seat in sorted(seat_games):
+        print(f"Seat {seat} | {seat_scores[seat] / seat_games[seat]:+.4f}")
+
+def print_length_histogram(lengths, num_bins, width=50):
+    print("\nGame length histogram (number of actions):")
+    if not lengths:
+        return
+
+    shortest, longest = min(lengths), max(lengths)
+    bin_size = max(1, -(-(longest - shortest + 1) // num_bins))
+
+    bins = Counter()
+    for length, count in lengths.items():
+        bins[(length - shortest) // bin_size] += count
+
+    largest_bin = max(bins.values())
+    for index in range(max(bins) + 1):
+        start = shortest + index * bin_size
+        label = f"{start}" if bin_size == 1 else f"{start}-{start + bin_size - 1}"
+        bar = "#" * round(width * bins[index] / largest_bin)
+        print(f"{label:>9} | {bins[index]:>9} {bar}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Aggregate the game logs written with --game-log.')
+
+    parser.add_argument('paths', nargs='+', metavar='PATH',
+                        help='Game log files, or directories with game log files.')
+
+    parser.add_argument('--bins', type=int, default=20,
+                        help='Maximum number of bins of the game length histogram. Defaults to 20.')
+
+    args = parser.parse_args()
+
+    reader = GameLogReader(args.paths)
+    pair_games, pair_scores, seat_scores, seat_games, lengths = analyze(reader)
+
+    print(f"{sum(pair_games.values())} games in {len(reader.get_paths())} files")
+    print_pair_scores(pair_games, pair_scores)
+    print_seat_scores(seat_scores, seat_games)
+    print_length_histogram(lengths, args.bins)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+import argparse
+import contextlib
+import json
+import os
+import random
+import signal
+import sys
+import time
+
+from constants import AVAILABLE_GAME_TYPES, AVAILABLE_PLAYER_TYPES, AVAILABLE_BATCH_GAME_TYPES
+from games.rng import derive_seed
+
+"""
+The metrics compared against the baseline, and whether a higher value is better
+"""
+METRICS = {
+    'games_per_sec': True,
+    'actions_per_sec': True,
+    'move_latency_p50_ms': False,
+    'move_latency_p99_ms': False,
+}
+
+"""
+Number of times a player that returns an invalid action is asked again, before it forfeits the game
+"""
+MAX_RETRIES = 10
+
+
+def is_interactive(player_type):
+    # human players wait for the console, so they can't be benchmarked
+    return player_type.__name__.startswith("Human")
+
+def timed(get_action, latencies):
+    # wraps the get_action of a player to measure the latency of each move
+    def get_timed_action(state):
+        start = time.perf_counter()
+        action = get_action(state)
+        latencies.append(time.perf_counter() - start)
+        return action
+    return get_timed_action
+
+def get_percentile(values, percentile):
+    # nearest-rank percentile
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(percentile / 100 * len(ordered)) - 1))]
+
+"""
+Runs a match of a player type against itself and measures it
+:param game: the game type (a key of AVAILABLE_GAME_TYPES)
+:param player_type: the player class
+:param num_games: number of games of the match (the seats are swapped after each game)
+:param seed: the seed of the match, so the same games are played in every run
+"""
+def run_benchmark(game, player_type, num_games, seed):
+    random.seed(derive_seed(seed, game, player_type.__name__))
+
+    latencies = []
+    players = [player_type(f"{player_type.__name__}-{seat}") for seat in range(2)]
+    for player in players:
+        player.get_action = timed(player.get_action, latencies)
+
+    simulator = AVAILABLE_GAME_TYPES[game](players)
+    simulator.set_history(num_games)
+    # a player that keeps returning invalid actions forfeits, like in the tournaments, instead of blocking the suite
+    simulator.set_invalid_action_policy(MAX_RETRIES)
+
+    start = time.perf_counter()
+    for _ in range(num_games):
+        simulator.run_simulation()
+        simulator.change_player_positions()
+    elapsed = time.perf_counter() - start
+
+    num_actions = sum(simulator.get_results().get_lengths())
+    result = {
+        'games': num_games,
+        'actions': num_actions,
+        'seconds': elapsed,
+        'games_per_sec': num_games / elapsed,
+        'actions_per_sec': num_actions / elapsed,
+        'move_latency_p50_ms': 1000 * get_percentile(latencies, 50),
+        'move_latency_p99_ms': 1000 * get_percentile(latencies, 99),
+    }
+
+    # the search players also report the nodes they searched (e.g. AdvancedMinimaxConnect4Player)
+    if all(hasattr(player, 'get_total_nodes') for player in players):
+        nodes = sum(player.get_total_nodes() for player in players)
+        result['nodes'] = nodes
+        result['nodes_per_sec'] = nodes / elapsed
+    return result
+
+"""
+Runs a match of a player type against itself in the batch simulator of the game and measures it
+The move latency is the time of each get_actions call divided by the number of games in the call
+:param batch_size: number of games played in lockstep
+"""
+def run_batch_benchmark(game, player_type, num_games, seed, batch_size):
+    random.seed(derive_seed(seed, game, player_type.__name__, "batch"))
+
+    latencies = []
+    players = [player_type(f"{player_type.__name__}-{seat}") for seat in range(2)]
+    for player in players:
+        player.get_actions = timed_batch(player.get_actions, latencies)
+
+    simulator = AVAILABLE_BATCH_GAME_TYPES[game](players)
+    simulator.set_invalid_action_policy(MAX_RETRIES)
+
+    start = time.perf_counter()
+    while simulator.get_num_games() < num_games:
+        simulator.run_simulation(min(batch_size, num_games - simulator.get_num_games()))
+    elapsed = time.perf_counter() - start
+
+    return {
+        'games': num_games,
+        'actions': simulator.get_num_actions(),
+        'seconds': elapsed,
+        'games_per_sec': num_games / elapsed,
+        'actions_per_sec': simulator.get_num_actions() / elapsed,
+        'move_latency_p50_ms': 1000 * get_percentile(latencies, 50),
+        'move_latency_p99_ms': 1000 * get_percentile(latencies, 99),
+    }
+
+def timed_batch(get_actions, latencies):
+    # wraps the get_actions of a player to measure the latency of each move
+    def get_timed_actions(grids):
+        start = time.perf_counter()
+        actions = get_actions(grids)
+        latencies.append((time.perf_counter() - start) / len(grids))
+        return actions
+    return get_timed_actions
+
+class BenchmarkTimeout(Exception):
+    pass
+
+def raise_timeout(signum, frame):
+    raise BenchmarkTimeout()
+
+"""
+Runs a benchmark, giving up after a timeout (a player that never returns a valid action would block the suite)
+The console output of the players is discarded, so it doesn't get mixed with the results
+:param benchmark: a function that runs the benchmark and returns its result
+:param timeout: the limit in seconds (None for no limit)
+:return: the result, or a dict with the error if the benchmark failed
+"""
+def run_guarded_benchmark(benchmark, timeout):
+    previous_handler = signal.signal(signal.SIGALRM, raise_timeout) if timeout is not None else None
+    try:
+        if timeout is not None:
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            return benchmark()
+    except BenchmarkTimeout:
+        return {'error': f"timed out after {timeout}s"}
+    except Exception as e:
+        return {'error': f"{e.__class__.__name__}: {e}"}
+    finally:
+        if timeout is not None:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+
+def run_benchmarks(games, num_games, seed, player_filter=None, timeout=None, batch_size=0):
+    results = {}
+    for game in games:
+        for player_type in AVAILABLE_PLAYER_TYPES[game]:
+            if is_interactive(player_type):
+                continue
+            if player_filter is not None and player_type.__name__ not in player_filter:
+                continue
+
+            key = f"{game}/{player_type.__name__}"
+            results[key] = run_guarded_benchmark(lambda: run_benchmark(game, player_type, num_games, seed), timeout)
+            print_result(key, results[key])
+
+            if batch_size > 0 and game in AVAILABLE_BATCH_GAME_TYPES:
+                key = f"{game}-batch/{player_type.__name__}"
+                results[key] = run_guarded_benchmark(
+                    lambda: run_batch_benchmark(game, player_type, num_games, seed, batch_size), timeout)
+                print_result(key, results[key])
+    return results
+
+def print_result(key, result):
+    if 'error' in result:
+        print(f"{key:<45} | failed: {result['error']}")
+        return
+    print(f"{key:<45} | {result['games_per_sec']:>10.1f} games/s | {result['actions_per_sec']:>11.1f} actions/s | "
+          f"p50 {result['move_latency_p50_ms']:>9.3f}ms | p99 {result['move_latency_p99_ms']:>9.3f}ms" +
+          (f" | {result['nodes_per_sec']:>9.1f} nodes/s" if 'nodes_per_sec' in result else ""))
+
+"""
+Compares the results against a baseline
+:param threshold: the relative change that counts as a regression (e.g. 0.1 for 10%)
+:return: a list with a description of each regression
+"""
+def compare(results, baseline, threshold):
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline or 'error' in baseline[key]:
+            continue
+        if 'error' in result:
+            regressions.append(f"{key}: {result['error']}")
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old, new = baseline[key][metric], result[metric]
+            if old <= 0:
+                continue
+            change = (new - old) / old
+            if (change < -threshold) if higher_is_better else (change > threshold):
+                regressions.append(f"{key} {metric}: {old:.3f} -> {new:.3f} ({change:+.1%})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Measures the throughput of each game and player type.')
+
+    parser.add_argument('--game', choices=AVAILABLE_GAME_TYPES.keys(), action='append', default=None,
+                        help='Game to benchmark (can be repeated). Defaults to every game.')
+
+    parser.add_argument('--player', action='append', default=None, metavar='NAME_PLAYER_CLASS',
+                        help='Player type to benchmark (can be repeated). Defaults to every player type except the human ones.')
+
+    parser.add_argument('--num-games', type=int, default=50,
+                        help='Number of games played by each player type against itself. Defaults to 50.')
+
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the matches. Defaults to 0.')
+
+    parser.add_argument('--batch-size', type=int, default=0,
+                        help='Also benchmarks the batch simulators (e.g. connect4), playing this number of games in lockstep. Defaults to 0 (off).')
+
+    parser.add_argument('--timeout', type=float, default=120,
+                        help='Time limit in seconds of the benchmark of each player type (0 for no limit). Defaults to 120.')
+
+    parser.add_argument('--output', default=None, metavar='PATH',
+                        help='File where the results are written as JSON. Defaults to not writing them.')
+
+    parser.add_argument('--baseline', default=None, metavar='PATH',
+                        help='JSON file of a previous run to compare the results against.')
+
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Relative change from the baseline that is reported as a regression. Defaults to 0.1 (10%%).')
+
+    args = parser.parse_args()
+
+    if args.num_games < 1:
+        parser.error("--num-games must be at least 1")
+
+    if args.batch_size < 0:
+        parser.error("--batch-size can't be negative")
+
+    if args.threshold < 0:
+        parser.error("--threshold can't be negative")
+
+    games = args.game if args.game is not None else list(AVAILABLE_GAME_TYPES.keys())
+    timeout = args.timeout if args.timeout > 0 else None
+    results = run_benchmarks(games, args.num_games, args.seed, args.player, timeout, args.batch_size)
+
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump({'seed': args.seed, 'num_games': args.num_games, 'results': results}, file, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            baseline = json.load(file)['results']
+
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regressions over {args.threshold:.0%}:")
+            for regression in regressions:
+                print(regression)
+            sys.exit(1)
+        print(f"\nNo regressions over {args.threshold:.0%}")
+
+if __name__ == '__main__':
+    main()
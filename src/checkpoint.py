@@ -0,0 +1,45 @@
+import os
+import pickle
+import time
+
+
+class Checkpoint:
+    """
+    Saves the progress of a tournament to a local file, so it can be resumed after a crash or a restart
+    """
+
+    """
+    :param path: the checkpoint file
+    :param interval: minimum number of seconds between the checkpoints saved in the middle of a pairing
+    """
+    def __init__(self, path: str, interval: float = 60.0):
+        self.__path = path
+        self.__interval = interval
+        self.__last_save = time.monotonic()
+
+    """
+    Returns true if the last checkpoint is older than the interval
+    """
+    def is_due(self) -> bool:
+        return time.monotonic() - self.__last_save >= self.__interval
+
+    """
+    Saves the progress (any picklable object)
+    """
+    def save(self, progress):
+        # the progress is written to a temporary file first, so a crash while saving never corrupts the last checkpoint
+        temporary_path = self.__path + ".tmp"
+        with open(temporary_path, "wb") as file:
+            pickle.dump(progress, file, protocol=pickle.HIGHEST_PROTOCOL)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, self.__path)
+        self.__last_save = time.monotonic()
+
+    """
+    Loads the progress saved in the last checkpoint
+    """
+    def load(self):
+        with open(self.__path, "rb") as file:
+            return pickle.load(file)
+
@@ -4,6 +4,7 @@ import pkgutil
 from inspect import isclass, getfile, getmodule
 from pathlib import Path
 
+from games.connect4.batch_simulator import Connect4BatchSimulator
 from games.connect4.simulator import Connect4Simulator
 from games.hlpoker.simulator import HLPokerSimulator
 from games.minesweeper.simulator import MinesweeperSimulator
@@ -14,6 +15,13 @@ AVAILABLE_GAME_TYPES = {
     "minesweeper":  MinesweeperSimulator
 }
 
+"""
+The games with a batch simulator, that plays many games in lockstep
+"""
+AVAILABLE_BATCH_GAME_TYPES = {
+    "connect4":     Connect4BatchSimulator
+}
+
 
 def __get_player_types(base_class):
     subclasses = []
@@ -0,0 +1,26 @@
+import dis
+
+"""
+Instructions that a function with an empty body (only `pass`, a docstring or `return None`) is made of
+"""
+NOOP_INSTRUCTIONS = ('RESUME', 'NOP', 'RETURN_VALUE')
+NOOP_CONST_INSTRUCTIONS = ('LOAD_CONST', 'RETURN_CONST')
+
+
+"""
+Checks if a function does nothing, by looking at its bytecode
+Functions whose bytecode can't be read (e.g. builtins) are never considered no-ops
+:param function: a function, or a method taken from a class
+"""
+def is_noop(function) -> bool:
+    code = getattr(function, '__code__', None)
+    if code is None:
+        return False
+
+    for instruction in dis.get_instructions(code):
+        if instruction.opname in NOOP_INSTRUCTIONS:
+            continue
+        if instruction.opname in NOOP_CONST_INSTRUCTIONS and instruction.argval is None:
+            continue
+        return False
+    return True
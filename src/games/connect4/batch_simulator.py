@@ -0,0 +1,199 @@
+import random
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from games.connect4.player import Connect4Player
+from games.connect4.result import Connect4Result
+from games.connect4.state import Connect4State
+from games.game_simulator import INVALID_ACTION_POLICIES
+
+
+class Connect4BatchSimulator:
+    """
+    Plays many games of Connect4 in lockstep, with the grids of all games stored in a single numpy array
+    In each turn, every unfinished game gets one move: the legal moves, the drops and the win checks are computed for all
+    games at once, and each player chooses its actions for all the games where it is acting with get_actions
+    It is meant for stateless players (e.g. random or greedy), so the player events are not sent
+    """
+
+    """
+    :param players: the two players
+    :param num_rows: the number of rows of the grids
+    :param num_cols: the number of cols of the grids
+    """
+    def __init__(self, players: list, num_rows: int = 6, num_cols: int = 7):
+        if len(players) != 2:
+            raise ValueError("Connect4BatchSimulator only supports games with 2 players")
+
+        for player in players:
+            if not isinstance(player, Connect4Player):
+                raise ValueError(f"{player.get_name()} is not a Connect4Player")
+            for event in ('event_new_game', 'event_action', 'event_result', 'event_end_game'):
+                if type(player).handles_event(event):
+                    raise ValueError(f"{player.get_name()} needs {event}, which Connect4BatchSimulator doesn't send")
+
+        names = [player.get_name() for player in players]
+        assert len(names) == len(set(names)), "Player names must be unique"
+
+        self.__players = players
+        self.__num_rows = num_rows
+        self.__num_cols = num_cols
+
+        # the running score totals of each player
+        self.__scores = {name: 0 for name in names}
+
+        # the number of games and actions played so far
+        self.__num_games = 0
+        self.__num_actions = 0
+
+        # the number of games forfeited by each player, by reason (e.g. 'invalid_action')
+        self.__forfeits = defaultdict(Counter)
+
+        # what happens when a player keeps returning invalid actions (see set_invalid_action_policy)
+        self.__max_retries = None
+        self.__invalid_action_policy = 'forfeit'
+
+    """
+    Sets what happens when a player returns invalid actions, like GameSimulator.set_invalid_action_policy. The player is
+    asked again for the games where its action is invalid, at most max_retries times
+    :param max_retries: number of times a player is asked again for an action (None to ask until it is valid)
+    :param policy: 'forfeit' to end the game as a forfeit of the player, or 'random' to play a random valid column
+    """
+    def set_invalid_action_policy(self, max_retries=None, policy='forfeit'):
+        if policy not in INVALID_ACTION_POLICIES:
+            raise ValueError(f"Unknown invalid action policy '{policy}', it must be one of {INVALID_ACTION_POLICIES}")
+        self.__max_retries = max_retries
+        self.__invalid_action_policy = policy
+
+    """
+    Plays a batch of games. The seats alternate between games, so both players start in half of them
+    :param num_games: the number of games of the batch
+    """
+    def run_simulation(self, num_games: int):
+        num_rows, num_cols = self.__num_rows, self.__num_cols
+
+        grids = np.full((num_games, num_rows, num_cols), Connect4State.EMPTY_CELL, dtype=np.int8)
+        # number of checkers in each column of each game
+        heights = np.zeros((num_games, num_cols), dtype=np.int64)
+        # the seat that won each game (-1 while there is no winner)
+        winners = np.full(num_games, -1, dtype=np.int64)
+        finished = np.zeros(num_games, dtype=bool)
+
+        # the index (in self.__players) of the player in the first seat of each game
+        first_player = np.arange(num_games) % 2
+
+        for turn in range(num_rows * num_cols):
+            active = np.flatnonzero(~finished)
+            if len(active) == 0:
+                break
+
+            # in lockstep, the acting seat is the same in every game
+            seat = turn % 2
+            cols = np.empty(len(active), dtype=np.int64)
+            forfeited = np.zeros(len(active), dtype=bool)
+            for index, player in enumerate(self.__players):
+                # the games where this player is in the acting seat
+                acting = (first_player[active] == index) if seat == 0 else (first_player[active] != index)
+                if acting.any():
+                    cols[acting], forfeited[acting] = self.__get_valid_actions(
+                        player, seat, grids[active[acting]], heights[active[acting]])
+
+            # the games forfeited by the acting seat are won by the other one, and get no checker
+            winners[active[forfeited]] = 1 - seat
+            finished[active[forfeited]] = True
+            active, cols = active[~forfeited], cols[~forfeited]
+
+            # drop the checkers
+            rows = num_rows - 1 - heights[active, cols]
+            grids[active, rows, cols] = seat
+            heights[active, cols] += 1
+            self.__num_actions += len(active)
+
+            won = active[self.__has_four(grids[active] == seat)]
+            winners[won] = seat
+            finished[won] = True
+            finished[heights.sum(axis=1) == num_rows * num_cols] = True
+
+        self.__update_scores(first_player, winners)
+
+    """
+    Gets the valid columns chosen by a player for a batch of games, asking it again for the games where they are invalid
+    :return: the column of each game, and which games the player forfeited by running out of retries
+    """
+    def __get_valid_actions(self, player, seat, grids, heights):
+        player.set_current_pos(seat)
+
+        cols = np.empty(len(grids), dtype=np.int64)
+        forfeited = np.zeros(len(grids), dtype=bool)
+        # the games (indices in grids) that still need a valid column
+        pending = np.arange(len(grids))
+        retries = 0
+        while True:
+            pending_grids = grids if len(pending) == len(grids) else grids[pending]
+            pending_grids.flags.writeable = False
+            chosen = np.asarray(player.get_actions(pending_grids), dtype=np.int64)
+            invalid = (chosen < 0) | (chosen >= self.__num_cols)
+            invalid[~invalid] = heights[pending[~invalid], chosen[~invalid]] >= self.__num_rows
+            cols[pending] = chosen
+            pending = pending[invalid]
+            if len(pending) == 0:
+                return cols, forfeited
+
+            # like the GameSimulator, the policy is applied when the player runs out of retries
+            if self.__max_retries is not None and retries >= self.__max_retries:
+                if self.__invalid_action_policy == 'forfeit':
+                    forfeited[pending] = True
+                    self.__forfeits[player.get_name()]['invalid_action'] += len(pending)
+                else:
+                    for game in pending:
+                        cols[game] = random.choice(np.flatnonzero(heights[game] < self.__num_rows).tolist())
+                return cols, forfeited
+            retries += 1
+
+    """
+    Checks which grids have four connected checkers
+    :param checkers: a boolean array with shape (games, rows, cols) with the cells of a player
+    """
+    @staticmethod
+    def __has_four(checkers):
+        across = checkers[:, :, :-3] & checkers[:, :, 1:-2] & checkers[:, :, 2:-1] & checkers[:, :, 3:]
+        up_down = checkers[:, :-3, :] & checkers[:, 1:-2, :] & checkers[:, 2:-1, :] & checkers[:, 3:, :]
+        downward = checkers[:, :-3, :-3] & checkers[:, 1:-2, 1:-2] & checkers[:, 2:-1, 2:-1] & checkers[:, 3:, 3:]
+        upward = checkers[:, 3:, :-3] & checkers[:, 2:-1, 1:-2] & checkers[:, 1:-2, 2:-1] & checkers[:, :-3, 3:]
+        return across.any(axis=(1, 2)) | up_down.any(axis=(1, 2)) | downward.any(axis=(1, 2)) | upward.any(axis=(1, 2))
+
+    def __update_scores(self, first_player, winners):
+        for index, player in enumerate(self.__players):
+            # the seat of the player in each game
+            seats = np.where(first_player == index, 0, 1)
+            wins = int(np.count_nonzero(winners == seats))
+            losses = int(np.count_nonzero((winners >= 0) & (winners != seats)))
+            self.__scores[player.get_name()] += wins * Connect4Result.WIN.value + losses * Connect4Result.LOOSE.value
+        self.__num_games += len(winners)
+
+    # prints the stats for all players
+    def print_stats(self):
+        for player in self.__players:
+            name = player.get_name()
+            print(f"Player {name} | Total score: {self.__scores[name]}$ | Avg. score per game: {self.__scores[name] / self.__num_games}$")
+
+    # returns the list of players
+    def get_players(self):
+        return self.__players
+
+    # gets the number of games played so far
+    def get_num_games(self):
+        return self.__num_games
+
+    # gets the number of actions played so far
+    def get_num_actions(self):
+        return self.__num_actions
+
+    # gets the number of games forfeited by each player, by reason (e.g. {'a': {'invalid_action': 2}})
+    def get_forfeits(self):
+        return {name: dict(reasons) for name, reasons in self.__forfeits.items()}
+
+    # gets the scores of all players
+    def get_global_score(self):
+        return dict(self.__scores)
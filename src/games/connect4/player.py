@@ -1,6 +1,9 @@
 from abc import ABC
 
+import numpy as np
+
 from games.connect4.result import Connect4Result
+from games.connect4.state import Connect4State
 from games.player import Player
 
 
@@ -29,3 +32,14 @@ class Connect4Player(Player, ABC):
 
     def event_result(self, pos: int, result):
         pass
+
+    """
+    Gets the actions for a batch of games of the Connect4BatchSimulator, where the player is acting in all of them
+    Players can override it with a vectorized version. By default, get_action is called for each game
+    :param grids: the grids of the games, as a read-only numpy array with shape (games, rows, cols)
+    :return: the selected column of each game, as a numpy array of ints
+    """
+    def get_actions(self, grids: np.ndarray) -> np.ndarray:
+        pos = self.get_current_pos()
+        return np.fromiter((self.get_action(Connect4State.from_grid(grid.tolist(), pos)).get_col() for grid in grids),
+                           dtype=np.int64, count=len(grids))
@@ -1,4 +1,5 @@
-from random import choice
+import numpy as np
+
 from games.connect4.action import Connect4Action
 from games.connect4.player import Connect4Player
 from games.connect4.state import Connect4State
@@ -26,7 +27,8 @@ class GreedyConnect4Player(Connect4Player):
                     count += 1
 
             # it swap the column if we exceed the count. if the count of chips is the same, we swap 50% of the times
-            if selected_col is None or count > max_count or (count == max_count and choice([False, True])):
+            if selected_col is None or count > max_count or \
+                    (count == max_count and self.get_rng().choice([False, True])):
                 selected_col = col
                 max_count = count
 
@@ -35,6 +37,13 @@ class GreedyConnect4Player(Connect4Player):
 
         return Connect4Action(selected_col)
 
+    def get_actions(self, grids: np.ndarray) -> np.ndarray:
+        # the legal column with most of our chips in each game, ties are broken at random
+        counts = (grids == self.get_current_pos()).sum(axis=1)
+        legal = grids[:, 0, :] == Connect4State.EMPTY_CELL
+        rng = np.random.default_rng(self.get_rng().getrandbits(64))
+        return np.where(legal, counts + rng.random(counts.shape), -1).argmax(axis=1)
+
     def event_action(self, pos: int, action, new_state: State):
         # ignore
         pass
@@ -1,145 +1,295 @@
 from games.connect4.action import Connect4Action
 from games.connect4.player import Connect4Player
 from games.connect4.state import Connect4State
+from games.search import SearchTimeout, iterative_deepening
+from games.transposition import TranspositionTable
 import math
+import time
 
 class AdvancedMinimaxConnect4Player(Connect4Player):
-    def __init__(self, name, depth=5):
+    """
+    Alpha-beta search with iterative deepening, which goes deeper until its budget of nodes or time per move is spent
+    The moves are tried best first, so more branches are cut: the best move found by the previous iteration (kept in
+    the transposition table), then the killer moves (the last moves that caused a cutoff at the same ply), then the
+    others by their history score (the cutoffs they caused), from the center column out
+    """
+
+    """
+    Number of killer moves kept for each ply
+    """
+    NUM_KILLERS = 2
+
+    """
+    :param max_nodes: the nodes searched for each move (None for no limit)
+    :param move_time: the seconds to choose each move (None for no limit), the time control of the simulator also applies
+    :param max_depth: the deepest search (None to search until the end of the game)
+    """
+    def __init__(self, name, max_nodes=20000, move_time=None, max_depth=None):
         super().__init__(name)
-        self.depth = depth
+        self.__max_nodes = max_nodes
+        self.__move_time = move_time
+        self.__max_depth = max_depth
+        # the values (or bounds) of the positions searched, kept between the moves of a game
+        self.__table = TranspositionTable()
+
+        # the columns by distance to the center, the killer moves of each ply, and the history score of each column
+        # for each player
+        self.__center_order = []
+        self.__killers = []
+        self.__history = [[], []]
+
+        # the player searching, and the search stops when it reaches this time (time.monotonic), or None without
+        # time limit
+        self.__player = 0
+        self.__stop_time = None
+
+        # the nodes searched for the current move, and in total, and the depths reached
+        self.__nodes = 0
+        self.__total_nodes = 0
+        self.__num_moves = 0
+        self.__depth = 0
+        self.__total_depth = 0
+
+    def get_transposition_table(self):
+        return self.__table
+
+    """
+    Gets the number of nodes searched for the last move
+    """
+    def get_nodes(self):
+        return self.__nodes
+
+    """
+    Gets the number of nodes searched for all the moves
+    """
+    def get_total_nodes(self):
+        return self.__total_nodes
+
+    """
+    Gets the depth of the last search that finished for the last move
+    """
+    def get_depth(self):
+        return self.__depth
+
+    def get_num_moves(self):
+        return self.__num_moves
+
+    def print_stats(self):
+        self.print_counters(self.get_name(), self.get_counters())
+
+    def get_counters(self):
+        return dict(self.__table.get_counters(), nodes=self.__total_nodes, moves=self.__num_moves,
+                    depth=self.__total_depth)
+
+    @classmethod
+    def print_counters(cls, name: str, counters: dict):
+        TranspositionTable.print_counters(name, counters)
+        if counters.get('moves', 0) > 0:
+            print(f"Player {name} | Nodes: {counters['nodes']} | "
+                  f"Nodes per move: {counters['nodes'] / counters['moves']:.0f} | "
+                  f"Avg. depth: {counters['depth'] / counters['moves']:.1f}")
+
+    def event_new_game(self):
+        # the values depend on the seat of the player, so they are only kept during a game
+        self.__table.clear()
+        self.__history = [[], []]
 
     def get_action(self, state: Connect4State):
         possible_actions = state.get_possible_actions()
         if not possible_actions:
             return Connect4Action(-1)
 
-        best_action = possible_actions[0]
-        alpha = -math.inf
-        beta = math.inf
+        self.__start_move(state)
+
+        # the search plays and takes back the moves in a single copy of the state (see Connect4State.undo)
+        search_state = state.clone()
+        # the best move of the last iteration that finished, which is searched first by the next one
+        principal_col = None
 
-        for action in possible_actions:
-            if state.validate_action(action):
-                simulated_state = state.clone()
-                simulated_state.update(action)
-                value = self.minimax(simulated_state, self.depth - 1, False, alpha, beta)
-                if value > alpha:
+        def search(depth):
+            nonlocal principal_col
+            best_action = None
+            alpha = -math.inf
+
+            for action in self.__order_actions(search_state, possible_actions, 0, principal_col):
+                search_state.update(action)
+                value = self.minimax(search_state, depth - 1, False, alpha, math.inf, 1)
+                search_state.undo()
+                if best_action is None or value > alpha:
                     alpha = value
                     best_action = action
 
-        return best_action
+            principal_col = best_action.get_col()
+            self.__depth = depth
+            return best_action
+
+        # the search deepens until its budget is spent, and the deepest search that finished is used
+        max_depth = state.get_num_rows() * state.get_num_cols() - sum(state.get_heights())
+        if self.__max_depth is not None:
+            max_depth = min(max_depth, self.__max_depth)
+        best_action = iterative_deepening(self, search, max_depth, budgeted=True)
+
+        self.__total_nodes += self.__nodes
+        self.__num_moves += 1
+        self.__total_depth += self.__depth
+        return best_action if best_action is not None else possible_actions[0]
+
+    def __start_move(self, state: Connect4State):
+        num_cols = state.get_num_cols()
+        if len(self.__center_order) != num_cols:
+            self.__center_order = [0] * num_cols
+            for rank, col in enumerate(sorted(range(num_cols), key=lambda c: abs(2 * c - (num_cols - 1)))):
+                self.__center_order[col] = rank
+        if len(self.__history[0]) != num_cols:
+            self.__history = [[0] * num_cols, [0] * num_cols]
+        else:
+            # the old cutoffs count less, since they were found in other positions
+            self.__history = [[score // 2 for score in scores] for scores in self.__history]
+
+        # the plies are counted from the current position, so the killer moves of the last move don't apply
+        self.__killers = [[None] * self.NUM_KILLERS for _ in range(state.get_num_rows() * num_cols + 1)]
+
+        # the deadline of the simulator leaves a margin to return the action (see Player.get_stop_time)
+        stop_times = []
+        if self.__move_time is not None:
+            stop_times.append(time.monotonic() + self.__move_time)
+        if self.get_stop_time() is not None:
+            stop_times.append(self.get_stop_time())
+        self.__stop_time = min(stop_times) if stop_times else None
+
+        self.__player = state.get_acting_player()
+        self.__nodes = 0
+        self.__depth = 0
+
+    def __count_node(self):
+        self.__nodes += 1
+        if self.__max_nodes is not None and self.__nodes > self.__max_nodes:
+            raise SearchTimeout()
+        if self.__stop_time is not None and time.monotonic() >= self.__stop_time:
+            raise SearchTimeout()
 
-    def minimax(self, state, depth, is_maximizing_player, alpha, beta):
+    """
+    Sorts the actions in the order they are searched: the first column (e.g. the best move found before), the killer
+    moves of the ply, and the other moves by history score and by distance to the center
+    """
+    def __order_actions(self, state: Connect4State, actions, ply: int, first_col):
+        killers = self.__killers[ply]
+        history = self.__history[state.get_acting_player()]
+        center_order = self.__center_order
+
+        def get_priority(action):
+            col = action.get_col()
+            if col == first_col:
+                return -2, 0, 0
+            if col in killers:
+                return -1, killers.index(col), 0
+            return 0, -history[col], center_order[col]
+
+        return sorted(actions, key=get_priority)
+
+    """
+    Remembers a move that caused a cutoff, so it is tried early in the other positions
+    """
+    def __add_cutoff(self, player: int, col: int, ply: int, depth: int):
+        killers = self.__killers[ply]
+        if col not in killers:
+            killers.insert(0, col)
+            killers.pop()
+        # the cutoffs far from the leaves save more nodes
+        self.__history[player][col] += depth * depth
+
+    def minimax(self, state, depth, is_maximizing_player, alpha, beta, ply=1):
+        self.__count_node()
         if depth == 0 or state.is_finished():
-            return self.evaluate(state)
+            # the leaves are scored for the searching player, whatever their depth, so the iterations agree
+            return self.evaluate(state, self.__player)
+
+        # a position searched at least as deep gives its value, or narrows the window with a bound
+        # and a position searched before gives its best move, which is searched first
+        key = state.get_hash()
+        entry = self.__table.probe(key)
+        first_col = None
+        if entry is not None:
+            _key, entry_depth, value, kind, first_col = entry
+            if entry_depth >= depth:
+                if kind == TranspositionTable.EXACT:
+                    return value
+                if kind == TranspositionTable.LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if beta <= alpha:
+                    return value
+        original_alpha, original_beta = alpha, beta
 
+        player = state.get_acting_player()
+        actions = self.__order_actions(state, state.get_possible_actions(), ply, first_col)
+        best_action = None
         if is_maximizing_player:
             max_eval = -math.inf
-            for action in state.get_possible_actions():
-                simulated_state = state.clone()
-                simulated_state.update(action)
-                eval = self.minimax(simulated_state, depth - 1, False, alpha, beta)
+            for action in actions:
+                state.update(action)
+                eval = self.minimax(state, depth - 1, False, alpha, beta, ply + 1)
+                state.undo()
+                if eval > max_eval or best_action is None:
+                    best_action = action
                 max_eval = max(max_eval, eval)
                 alpha = max(alpha, eval)
                 if beta <= alpha:
+                    self.__add_cutoff(player, action.get_col(), ply, depth)
                     break
-            return max_eval
+            value = max_eval
         else:
             min_eval = math.inf
-            for action in state.get_possible_actions():
-                simulated_state = state.clone()
-                simulated_state.update(action)
-                eval = self.minimax(simulated_state, depth - 1, True, alpha, beta)
+            for action in actions:
+                state.update(action)
+                eval = self.minimax(state, depth - 1, True, alpha, beta, ply + 1)
+                state.undo()
+                if eval < min_eval or best_action is None:
+                    best_action = action
                 min_eval = min(min_eval, eval)
                 beta = min(beta, eval)
                 if beta <= alpha:
+                    self.__add_cutoff(player, action.get_col(), ply, depth)
                     break
-            return min_eval
-
-    def check_winner(self, grid, player):
-        num_rows = len(grid)
-        num_cols = len(grid[0])
-
-        # Check horizontal locations for win
-        for c in range(num_cols-3):
-            for r in range(num_rows):
-                if grid[r][c] == player and grid[r][c+1] == player and grid[r][c+2] == player and grid[r][c+3] == player:
-                    return True
-
-        # Check vertical locations for win
-        for c in range(num_cols):
-            for r in range(num_rows-3):
-                if grid[r][c] == player and grid[r+1][c] == player and grid[r+2][c] == player and grid[r+3][c] == player:
-                    return True
-
-        # Check positively sloped diaganols
-        for c in range(num_cols-3):
-            for r in range(3, num_rows):
-                if grid[r][c] == player and grid[r-1][c+1] == player and grid[r-2][c+2] == player and grid[r-3][c+3] == player:
-                    return True
-
-        # Check negatively sloped diaganols
-        for c in range(num_cols-3):
-            for r in range(num_rows-3):
-                if grid[r][c] == player and grid[r+1][c+1] == player and grid[r+2][c+2] == player and grid[r+3][c+3] == player:
-                    return True
-
-        return False
-
-    def evaluate(self, state):
-        grid = state.get_grid()
-        current_player = state.get_acting_player()
-        last_player = 1 if current_player == 0 else 0  # Toggle to find the last player
+            value = min_eval
+
+        # a value outside of the window is only a bound, because the search stopped at a cutoff
+        if value <= original_alpha:
+            kind = TranspositionTable.UPPER
+        elif value >= original_beta:
+            kind = TranspositionTable.LOWER
+        else:
+            kind = TranspositionTable.EXACT
+        # the column is kept instead of the action, so the entries only hold numbers, which the garbage collector skips
+        self.__table.store(key, depth, value, kind, best_action.get_col())
+        return value
+
+    """
+    Scores a state for a player (by default, the acting player), from the open windows of both players (see
+    Connect4State.get_open_windows), which the state keeps up to date with each move
+    """
+    def evaluate(self, state, player=None):
+        current_player = state.get_acting_player() if player is None else player
+        last_player = 1 if state.get_acting_player() == 0 else 0  # Toggle to find the last player
+        open_windows = state.get_open_windows()
 
         if state.is_finished():
-            if self.check_winner(grid, last_player):
-                return math.inf if last_player == state.get_acting_player() else -math.inf
+            if open_windows[last_player][4] > 0:
+                return math.inf if last_player == current_player else -math.inf
             else:
                 return 0  # Handle draw or game still ongoing with no more moves
 
-        score = 0
-        num_rows = state.get_num_rows()
-        num_cols = state.get_num_cols()
-
-        my_symbol = current_player
-        opponent_symbol = 1 - my_symbol
+        my_windows = open_windows[current_player]
+        opponent_windows = open_windows[1 - current_player]
 
         # Scoring settings for potential and immediate threats
         three_in_a_row = 100
         two_in_a_row = 10
         block_opponent_three = 80  # High value for blocking an opponent's three in a row
 
-        # Helper function to count in-line discs
-        def count_line(row, col, d_row, d_col, symbol):
-            count = 0
-            for i in range(4):
-                if 0 <= row + d_row * i < num_rows and 0 <= col + d_col * i < num_cols:
-                    if grid[row + d_row * i][col + d_col * i] == symbol:
-                        count += 1
-                    elif grid[row + d_row * i][col + d_col * i] != Connect4State.EMPTY_CELL:
-                        return 0  # Blockage in the line
-            return count
-
-        # Check all possible directions
-        directions = [(0, 1), (1, 0), (1, 1), (-1, 1)]  # Horizontal, Vertical, Diagonal-right, Diagonal-left
-
-        for row in range(num_rows):
-            for col in range(num_cols):
-                if grid[row][col] == Connect4State.EMPTY_CELL:
-                    # Evaluate potential for 'my_symbol'
-                    for d_row, d_col in directions:
-                        if count_line(row, col, d_row, d_col, my_symbol) == 3:
-                            score += three_in_a_row
-                        if count_line(row, col, d_row, d_col, my_symbol) == 2:
-                            score += two_in_a_row
-
-                    # Evaluate blocking opponent's potential wins
-                    for d_row, d_col in directions:
-                        if count_line(row, col, d_row, d_col, opponent_symbol) == 3:
-                            score += block_opponent_three
-
-        return score
-
-
+        return (three_in_a_row * my_windows[3] + two_in_a_row * my_windows[2] +
+                block_opponent_three * opponent_windows[3])
 
     def event_action(self, pos: int, action, new_state):
         # Optional: Implement any special logic when an action is taken
@@ -1,4 +1,6 @@
-from random import randint, choice
+from random import randint
+
+import numpy as np
 
 from games.connect4.action import Connect4Action
 from games.connect4.player import Connect4Player
@@ -12,7 +14,13 @@ class RandomConnect4Player(Connect4Player):
         super().__init__(name)
 
     def get_action(self, state: Connect4State):
-        return choice(state.get_possible_actions())
+        return self.get_rng().choice(state.get_possible_actions())
+
+    def get_actions(self, grids: np.ndarray) -> np.ndarray:
+        # a random legal column in each game (the columns with an empty top cell)
+        legal = grids[:, 0, :] == Connect4State.EMPTY_CELL
+        rng = np.random.default_rng(self.get_rng().getrandbits(64))
+        return np.where(legal, rng.random(legal.shape), -1).argmax(axis=1)
 
     def event_action(self, pos: int, action, new_state: State):
         # ignore
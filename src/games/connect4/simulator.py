@@ -29,6 +29,9 @@ class Connect4Simulator(GameSimulator):
         # ignored for this simulator
         pass
 
+    def encode_action(self, action: Connect4Action) -> int:
+        return action.get_col()
+
     @staticmethod
     def get_player_type():
         return Connect4Player
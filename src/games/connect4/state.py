@@ -1,3 +1,4 @@
+import random
 from typing import Optional
 
 from termcolor import colored
@@ -10,6 +11,57 @@ from games.state import State
 class Connect4State(State):
     EMPTY_CELL = -1
 
+    MUTATING_METHODS = State.MUTATING_METHODS + ('undo', 'unplay')
+
+    """
+    The Zobrist keys of each board size (see get_zobrist_keys)
+    """
+    __zobrist_tables = {}
+
+    """
+    Gets the Zobrist keys of a board size: a random 64-bit key for each player and cell (with the layout of the
+    bitboards), and a key for the second player acting. They come from a fixed seed, so the hashes are the same in
+    every process, and the global random stream is not used
+    """
+    @staticmethod
+    def get_zobrist_keys(num_rows: int, num_cols: int):
+        keys = Connect4State.__zobrist_tables.get((num_rows, num_cols))
+        if keys is None:
+            rng = random.Random(f"connect4-zobrist-{num_rows}x{num_cols}")
+            cells = num_cols * (num_rows + 1)
+            keys = ([rng.getrandbits(64) for _cell in range(cells)], [rng.getrandbits(64) for _cell in range(cells)],
+                    rng.getrandbits(64))
+            Connect4State.__zobrist_tables[(num_rows, num_cols)] = keys
+        return keys
+
+    """
+    The winning windows of each board size (see get_windows)
+    """
+    __window_tables = {}
+
+    """
+    Gets the winning windows of a board size: every line of 4 cells (across, up and both diagonals), as a tuple of the
+    bits of its cells (with the layout of the bitboards), and for each bit the indices of the windows that contain it
+    """
+    @staticmethod
+    def get_windows(num_rows: int, num_cols: int):
+        windows = Connect4State.__window_tables.get((num_rows, num_cols))
+        if windows is None:
+            lines = []
+            for col in range(num_cols):
+                for row in range(num_rows):
+                    for d_col, d_row in ((1, 0), (0, 1), (1, 1), (1, -1)):
+                        end_col, end_row = col + 3 * d_col, row + 3 * d_row
+                        if end_col < num_cols and 0 <= end_row < num_rows:
+                            lines.append(tuple((col + i * d_col) * (num_rows + 1) + row + i * d_row for i in range(4)))
+            cell_windows = [[] for _cell in range(num_cols * (num_rows + 1))]
+            for window, line in enumerate(lines):
+                for bit in line:
+                    cell_windows[bit].append(window)
+            windows = (lines, [tuple(indices) for indices in cell_windows])
+            Connect4State.__window_tables[(num_rows, num_cols)] = windows
+        return windows
+
     def __init__(self, num_rows: int = 6, num_cols: int = 7):
         super().__init__()
 
@@ -25,9 +77,41 @@ class Connect4State(State):
         self.__num_cols = num_cols
 
         """
-        the grid
+        the board is stored as a bitboard: one int per player, where each column takes num_rows + 1 bits (from the
+        bottom row up, plus an empty bit on top so the lines don't wrap between columns)
+        """
+        self.__boards = [0, 0]
+
+        """
+        the number of checkers in each column
+        """
+        self.__heights = [0] * num_cols
+
+        """
+        the Zobrist hash of the position (see get_hash), updated with each move
+        """
+        self.__zobrist_keys = Connect4State.get_zobrist_keys(num_rows, num_cols)
+        self.__hash = 0
+
+        """
+        the columns of the moves played so far, so they can be undone (see undo)
+        """
+        self.__moves = []
+
+        """
+        the grid (see get_grid), built from the bitboards when it is asked for, and None until then
+        """
+        self.__grid = None
+
+        """
+        the number of checkers of each player in each winning window, and the number of open windows of each player by
+        number of checkers (see get_open_windows). They are None until they are asked for, and then they are updated
+        with each move
         """
-        self.__grid = [[Connect4State.EMPTY_CELL for _i in range(self.__num_cols)] for _j in range(self.__num_rows)]
+        self.__window_counts = None
+        self.__open_windows = None
+        # the windows of each cell (see get_windows), set with the counts
+        self.__cell_windows = None
 
         """
         counts the number of turns in the current game
@@ -44,48 +128,118 @@ class Connect4State(State):
         """
         self.__has_winner = False
 
-    def __check_winner(self, player):
-        # check for 4 across
-        for row in range(0, self.__num_rows):
-            for col in range(0, self.__num_cols - 3):
-                if self.__grid[row][col] == player and \
-                        self.__grid[row][col + 1] == player and \
-                        self.__grid[row][col + 2] == player and \
-                        self.__grid[row][col + 3] == player:
-                    return True
-
-        # check for 4 up and down
-        for row in range(0, self.__num_rows - 3):
-            for col in range(0, self.__num_cols):
-                if self.__grid[row][col] == player and \
-                        self.__grid[row + 1][col] == player and \
-                        self.__grid[row + 2][col] == player and \
-                        self.__grid[row + 3][col] == player:
-                    return True
-
-        # check upward diagonal
-        for row in range(3, self.__num_rows):
-            for col in range(0, self.__num_cols - 3):
-                if self.__grid[row][col] == player and \
-                        self.__grid[row - 1][col + 1] == player and \
-                        self.__grid[row - 2][col + 2] == player and \
-                        self.__grid[row - 3][col + 3] == player:
-                    return True
-
-        # check downward diagonal
-        for row in range(0, self.__num_rows - 3):
-            for col in range(0, self.__num_cols - 3):
-                if self.__grid[row][col] == player and \
-                        self.__grid[row + 1][col + 1] == player and \
-                        self.__grid[row + 2][col + 2] == player and \
-                        self.__grid[row + 3][col + 3] == player:
-                    return True
-
+    """
+    Checks if a bitboard has four connected checkers, shifting it in each direction (up, across and both diagonals)
+    """
+    def __has_four(self, board):
+        for shift in (1, self.__num_rows + 1, self.__num_rows, self.__num_rows + 2):
+            pairs = board & (board >> shift)
+            if pairs & (pairs >> (2 * shift)):
+                return True
         return False
 
+    def __check_winner(self, player):
+        return self.__has_four(self.__boards[player])
+
+    """
+    Gets the grid as a list of rows, from the top row down, with the index of the player in each cell (or EMPTY_CELL)
+    It is a view built from the bitboards, kept until the next update, so it must not be changed
+    """
     def get_grid(self):
+        if self.__grid is None:
+            num_rows = self.__num_rows
+            board0 = self.__boards[0]
+            grid = [[Connect4State.EMPTY_CELL] * self.__num_cols for _row in range(num_rows)]
+            # only the cells with a checker are filled, from the bottom of each column up
+            for col, col_height in enumerate(self.__heights):
+                bit = col * (num_rows + 1)
+                for row in range(num_rows - 1, num_rows - 1 - col_height, -1):
+                    grid[row][col] = 0 if (board0 >> bit) & 1 else 1
+                    bit += 1
+            self.__grid = grid
         return self.__grid
 
+    """
+    Gets the bitboard of a player (see __init__ for the layout)
+    """
+    def get_board(self, player: int) -> int:
+        return self.__boards[player]
+
+    """
+    Gets the Zobrist hash of the position: the same checkers with the same player acting give the same hash, whatever
+    the order of the moves that led to them
+    """
+    def get_hash(self) -> int:
+        return self.__hash
+
+    """
+    Gets the number of open windows of each player by number of checkers: open_windows[player][n] is the number of
+    winning windows (see get_windows) with n checkers of the player and none of the other player
+    The counts are built the first time they are asked for, and from then on they are updated with each move, so the
+    evaluations of a search cost the windows of the moves played instead of a scan of the board
+    The lists are updated in place, so they must not be changed
+    """
+    def get_open_windows(self):
+        if self.__open_windows is None:
+            lines, self.__cell_windows = Connect4State.get_windows(self.__num_rows, self.__num_cols)
+            self.__window_counts = [[sum((board >> bit) & 1 for bit in line) for line in lines]
+                                    for board in self.__boards]
+            self.__open_windows = [[0] * 5, [0] * 5]
+            for counts, other_counts, open_windows in zip(self.__window_counts, reversed(self.__window_counts),
+                                                          self.__open_windows):
+                for count, other_count in zip(counts, other_counts):
+                    if other_count == 0:
+                        open_windows[count] += 1
+        return self.__open_windows
+
+    """
+    Adds (delta 1) or removes (delta -1) a checker of a player in the window counts
+    """
+    def __update_windows(self, player: int, bit: int, delta: int):
+        counts, other_counts = self.__window_counts[player], self.__window_counts[1 - player]
+        open_windows, other_open_windows = self.__open_windows[player], self.__open_windows[1 - player]
+        for window in self.__cell_windows[bit]:
+            count = counts[window]
+            new_count = count + delta
+            counts[window] = new_count
+            other_count = other_counts[window]
+            if other_count == 0:
+                open_windows[count] -= 1
+                open_windows[new_count] += 1
+            # the window is open for the other player while the player has no checker in it
+            if count == 0 or new_count == 0:
+                other_open_windows[other_count] -= delta
+
+    """
+    Gets the number of checkers in each column
+    """
+    def get_heights(self):
+        return self.__heights
+
+    """
+    Creates the state of a game in progress from its grid (e.g. a game of the Connect4BatchSimulator)
+    :param grid: the grid, as a list of rows
+    :param acting_player: the index of the acting player
+    """
+    @staticmethod
+    def from_grid(grid, acting_player: int):
+        num_rows, num_cols = len(grid), len(grid[0])
+        state = Connect4State(num_rows, num_cols)
+        for row in range(num_rows):
+            for col in range(num_cols):
+                cell = grid[row][col]
+                if cell != Connect4State.EMPTY_CELL:
+                    bit = col * (num_rows + 1) + num_rows - 1 - row
+                    state.__boards[cell] |= 1 << bit
+                    state.__hash ^= state.__zobrist_keys[cell][bit]
+                    state.__heights[col] += 1
+        state.__acting_player = acting_player
+        if acting_player == 1:
+            state.__hash ^= state.__zobrist_keys[2]
+        state.__turns_count = 1 + sum(state.__heights)
+        state.__has_winner = state.__check_winner(0) or state.__check_winner(1)
+        return state
+
     def get_num_players(self):
         return 2
 
@@ -97,7 +251,7 @@ class Connect4State(State):
             return False
 
         # full column
-        if self.__grid[0][col] != Connect4State.EMPTY_CELL:
+        if self.__heights[col] >= self.__num_rows:
             return False
 
         return True
@@ -106,12 +260,16 @@ class Connect4State(State):
         col = action.get_col()
 
         # drop the checker
-        for row in range(self.__num_rows - 1, -1, -1):
-            if self.__grid[row][col] < 0:
-                self.__grid[row][col] = self.__acting_player
-                break
-
-        # determine if there is a winner
+        bit = col * (self.__num_rows + 1) + self.__heights[col]
+        self.__boards[self.__acting_player] |= 1 << bit
+        self.__hash ^= self.__zobrist_keys[self.__acting_player][bit] ^ self.__zobrist_keys[2]
+        self.__heights[col] += 1
+        self.__moves.append(col)
+        self.__grid = None
+        if self.__open_windows is not None:
+            self.__update_windows(self.__acting_player, bit, 1)
+
+        # determine if there is a winner (only the player that moved can have won)
         self.__has_winner = self.__check_winner(self.__acting_player)
 
         # switch to next player
@@ -119,8 +277,41 @@ class Connect4State(State):
 
         self.__turns_count += 1
 
+    """
+    Takes back the last move, so searches can play and take back moves in the same state instead of cloning it
+    The state is restored exactly, including the acting player, the turn count and the winner flag
+    """
+    def undo(self):
+        col = self.__moves.pop()
+        self.__heights[col] -= 1
+        # the player that made the move acts again
+        self.__acting_player = 1 - self.__acting_player
+        bit = col * (self.__num_rows + 1) + self.__heights[col]
+        self.__boards[self.__acting_player] &= ~(1 << bit)
+        self.__hash ^= self.__zobrist_keys[self.__acting_player][bit] ^ self.__zobrist_keys[2]
+        self.__grid = None
+        if self.__open_windows is not None:
+            self.__update_windows(self.__acting_player, bit, -1)
+        self.__turns_count -= 1
+        # a game ends at the first win, so there was no winner before the last move
+        self.__has_winner = False
+
+    """
+    Takes back an action, which must be the last one played (see undo)
+    """
+    def unplay(self, action: Connect4Action):
+        if not self.__moves or self.__moves[-1] != action.get_col():
+            raise ValueError(f"{action.get_col()} is not the last move played")
+        self.undo()
+
+    """
+    Gets the columns of the moves played so far (only the moves played since the state was created from a grid)
+    """
+    def get_moves(self):
+        return self.__moves
+
     def __display_cell(self, row, col):
-        cell_value = self.__grid[row][col]
+        cell_value = self.get_grid()[row][col]
         if cell_value == 0:
             # Player 1 - Red
             print(colored('●', 'red'), end="")
@@ -169,12 +360,19 @@ class Connect4State(State):
 
     def clone(self):
         cloned_state = Connect4State(self.__num_rows, self.__num_cols)
+        cloned_state.__boards = self.__boards.copy()
+        cloned_state.__heights = self.__heights.copy()
+        cloned_state.__moves = self.__moves.copy()
+        cloned_state.__hash = self.__hash
+        # the grid is never changed once it is built, so it can be shared until one of the states is updated
+        cloned_state.__grid = self.__grid
+        if self.__open_windows is not None:
+            cloned_state.__window_counts = [counts.copy() for counts in self.__window_counts]
+            cloned_state.__open_windows = [open_windows.copy() for open_windows in self.__open_windows]
+            cloned_state.__cell_windows = self.__cell_windows
         cloned_state.__turns_count = self.__turns_count
         cloned_state.__acting_player = self.__acting_player
         cloned_state.__has_winner = self.__has_winner
-        for row in range(0, self.__num_rows):
-            for col in range(0, self.__num_cols):
-                cloned_state.__grid[row][col] = self.__grid[row][col]
         return cloned_state
 
     def get_result(self, pos):
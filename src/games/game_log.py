@@ -0,0 +1,180 @@
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+"""
+Game logs are binary files with a header followed by records of two types:
+    - name records ('N'): the id of a player and its name, written the first time the player shows up in the file
+    - game records ('G'): the number of players, the number of actions and of recorded actions, the id and the score
+      of the player in each seat (in seat order), and the recorded actions (as ints, see GameSimulator.encode_action)
+"""
+HEADER = b"GLOG1"
+NAME_RECORD = b"N"
+GAME_RECORD = b"G"
+
+NAME_FORMAT = struct.Struct("<HH")
+GAME_FORMAT = struct.Struct("<BII")
+SEAT_FORMAT = struct.Struct("<Hd")
+
+"""
+A game read from a game log
+:param players: the names of the players, in seat order
+:param scores: the scores of the players, in seat order
+:param num_actions: the number of actions in the game
+:param actions: the encoded actions, or None if they were not recorded
+"""
+GameRecord = namedtuple('GameRecord', ['players', 'scores', 'num_actions', 'actions'])
+
+
+class GameLogWriter:
+    """
+    Streams one record per finished game to a binary file
+    The records are buffered and written in batches, so the memory used doesn't grow with the number of games
+    """
+
+    """
+    :param path: the file of the log (a new file is created)
+    :param record_actions: if true, the sequence of actions of each game is also written
+    :param batch_size: number of games buffered before they are written to the file
+    """
+    def __init__(self, path: str, record_actions: bool = False, batch_size: int = 1024):
+        self.__path = path
+        self.__file = open(path, "wb")
+        self.__file.write(HEADER)
+        # the size of the file with the games written so far
+        self.__offset = len(HEADER)
+        self.__record_actions = record_actions
+        self.__batch_size = batch_size
+        self.__buffer = bytearray()
+        self.__buffered_games = 0
+
+        """
+        the id of each player name written so far
+        """
+        self.__player_ids = {}
+
+    def get_path(self) -> str:
+        return self.__path
+
+    def records_actions(self) -> bool:
+        return self.__record_actions
+
+    """
+    Writes the buffered games and gets the size of the file, which only has whole records (e.g. to cut off the games
+    written after a checkpoint)
+    """
+    def get_offset(self) -> int:
+        if not self.__file.closed:
+            self.flush()
+        return self.__offset
+
+    def __get_player_id(self, name):
+        player_id = self.__player_ids.get(name)
+        if player_id is None:
+            player_id = len(self.__player_ids)
+            self.__player_ids[name] = player_id
+            encoded_name = name.encode("utf-8")
+            self.__buffer += NAME_RECORD + NAME_FORMAT.pack(player_id, len(encoded_name)) + encoded_name
+        return player_id
+
+    """
+    Writes a finished game
+    :param players: the names of the players, in seat order
+    :param scores: the scores of the players, in seat order
+    :param num_actions: the number of actions in the game
+    :param actions: the encoded actions (ignored unless the writer records actions)
+    """
+    def write_game(self, players, scores, num_actions: int, actions=None):
+        player_ids = [self.__get_player_id(name) for name in players]
+        actions = actions if self.__record_actions and actions is not None else []
+
+        self.__buffer += GAME_RECORD + GAME_FORMAT.pack(len(players), num_actions, len(actions))
+        for player_id, score in zip(player_ids, scores):
+            self.__buffer += SEAT_FORMAT.pack(player_id, score)
+        if actions:
+            self.__buffer += struct.pack(f"<{len(actions)}i", *actions)
+
+        self.__buffered_games += 1
+        if self.__buffered_games >= self.__batch_size:
+            self.flush()
+
+    def flush(self):
+        self.__file.write(self.__buffer)
+        self.__file.flush()
+        self.__offset += len(self.__buffer)
+        self.__buffer.clear()
+        self.__buffered_games = 0
+
+    def close(self):
+        if not self.__file.closed:
+            self.flush()
+            self.__file.close()
+
+
+class GameLogReader:
+    """
+    Reads the games of one or more game log files (directories are scanned for *.gamelog files)
+    """
+
+    def __init__(self, paths):
+        self.__paths = []
+        for path in paths:
+            if os.path.isdir(path):
+                self.__paths.extend(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                           if name.endswith(".gamelog")))
+            else:
+                self.__paths.append(path)
+
+    def get_paths(self):
+        return self.__paths
+
+    def __iter__(self):
+        for path in self.__paths:
+            yield from GameLogReader.read_file(path)
+
+    @staticmethod
+    def read_file(path):
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size < len(HEADER):
+                raise ValueError(f"{path} is not a game log")
+            # the file is memory-mapped, so big logs are not loaded into memory at once
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if data[:len(HEADER)] != HEADER:
+                    raise ValueError(f"{path} is not a game log")
+                yield from GameLogReader.__read_records(path, data)
+
+    @staticmethod
+    def __read_records(path, data):
+        names = {}
+        offset = len(HEADER)
+        while offset < len(data):
+            record_type = data[offset:offset + 1]
+            offset += 1
+
+            if record_type == NAME_RECORD:
+                player_id, length = NAME_FORMAT.unpack_from(data, offset)
+                offset += NAME_FORMAT.size
+                names[player_id] = data[offset:offset + length].decode("utf-8")
+                offset += length
+
+            elif record_type == GAME_RECORD:
+                num_players, num_actions, num_recorded_actions = GAME_FORMAT.unpack_from(data, offset)
+                offset += GAME_FORMAT.size
+
+                players, scores = [], []
+                for _ in range(num_players):
+                    player_id, score = SEAT_FORMAT.unpack_from(data, offset)
+                    offset += SEAT_FORMAT.size
+                    players.append(names[player_id])
+                    scores.append(score)
+
+                actions = None
+                if num_recorded_actions > 0:
+                    actions = list(struct.unpack_from(f"<{num_recorded_actions}i", data, offset))
+                    offset += 4 * num_recorded_actions
+
+                yield GameRecord(players, scores, num_actions, actions)
+
+            else:
+                raise ValueError(f"{path} has an invalid record at byte {offset - 1}")
@@ -1,7 +1,25 @@
+import inspect
+import random
+import time
+import weakref
 from abc import ABC, abstractmethod
+from collections import defaultdict, Counter
 
+from games.callbacks import is_noop
+from games.instrumentation import Instrumentation, TimedStateView
 from games.player import Player
+from games.result_store import ResultStore
+from games.rng import derive_seed
+from games.sandbox import SandboxError
+from games.seating import PermutationSchedule, SEAT_SCHEDULES
 from games.state import State
+from games.state_view import StateView
+
+
+"""
+What the simulator can do when a player runs out of retries for an invalid action (see set_invalid_action_policy)
+"""
+INVALID_ACTION_POLICIES = ('forfeit', 'random')
 
 
 class GameSimulator(ABC):
@@ -14,40 +32,79 @@ class GameSimulator(ABC):
         names = [player.get_name() for player in players]
         assert len(names) == len(set(names)), "Player names must be unique"
 
-        # stores the possible permutations between players
-        self.__permutations = []
+        # the players in their initial order
+        self.__players = list(players)
 
-        self.heap_permutation(players, len(players))
+        # the counters of the players when the simulator was created, so only the ones of its games are reported
+        self.__initial_counters = {name: player.get_counters() for name, player in zip(names, players)}
 
-        # the selected permutation for the current game
-        self.__current_permutation = 0
+        # decides the seats of the players in each game (all the permutations by default, see set_seat_schedule)
+        self.__seat_schedule = PermutationSchedule(players)
 
-        # the results of all games between all players
-        self.__results = []
+        # the running score totals of each player, so the global score doesn't need to go through all results
+        self.__scores = {name: 0 for name in names}
 
-    """
-    Adapted from https://www.geeksforgeeks.org/heaps-algorithm-for-generating-permutations/
-    It allows for generating all possible permutations of seats in a game
-    """
+        # the number of games played so far
+        self.__num_games = 0
+
+        # the results of the games between all players (all of them by default, see set_history)
+        self.__results = ResultStore(names)
+
+        # optional sink (e.g. a GameLogWriter) that receives a record of each finished game
+        self.__game_log = None
+
+        # the state views handed to the players that are still referenced (most players drop them right away)
+        self.__views = weakref.WeakSet()
+
+        # the players that need each event, so the events (and their state views) are skipped for the others
+        self.__listeners = {event: {player for player in players if type(player).handles_event(event)}
+                            for event in ('event_new_game', 'event_action', 'event_result', 'event_end_game')}
+
+        # the players with an async get_action, which can only play with run_simulation_async
+        self.__async_players = [player for player in players if inspect.iscoroutinefunction(player.get_action)]
+
+        # the hooks of this simulator that do something, the empty ones are not called
+        self.__hooks = {hook for hook in ('on_state_update', 'on_before_end_game', 'on_end_game')
+                        if not is_noop(getattr(type(self), hook))}
+
+        # the time control (see set_time_control), off by default
+        self.__move_time = None
+        self.__game_time = None
+        self.__time_increment = 0.0
 
-    def heap_permutation(self, a: list, size: int):
-        if size == 1:
-            self.__permutations.append(a.copy())
+        # the number of games forfeited by each player, by reason (e.g. 'timeout')
+        self.__forfeits = defaultdict(Counter)
 
-        for i in range(0, size):
-            self.heap_permutation(a, size - 1)
+        # records the timings of the callbacks when it is set (see set_instrumentation)
+        self.__instrumentation = None
 
-            if size % 2 == 1:
-                temp = a[0]
-                a[0] = a[size - 1]
-                a[size - 1] = temp
-            else:
-                temp = a[i]
-                a[i] = a[size - 1]
-                a[size - 1] = temp
+        # what happens when a player keeps returning invalid actions (see set_invalid_action_policy)
+        self.__max_retries = None
+        self.__invalid_action_policy = 'forfeit'
+
+        # the number of invalid actions returned by each player, and the seconds spent choosing them
+        self.__invalid_actions = defaultdict(lambda: {'attempts': 0, 'seconds': 0.0})
+
+        # the random stream of the current game (see set_seed), the random module itself when there is no seed
+        self.__seed = None
+        self.__first_game = 0
+        self.__rng = random
+
+    """
+    Sets how the seats of the players change between games, starting again from the initial order of the players
+    :param schedule: the name of a seat schedule (see games.seating.SEAT_SCHEDULES): 'permutations' (the default) goes
+    through all the n! permutations, 'rotations' through the n rotations and 'balanced' through a balanced Latin square
+    """
+    def set_seat_schedule(self, schedule: str):
+        if schedule not in SEAT_SCHEDULES:
+            raise ValueError(f"Unknown seat schedule '{schedule}', it must be one of {tuple(SEAT_SCHEDULES)}")
+        self.__seat_schedule = SEAT_SCHEDULES[schedule](self.__players)
+
+    def get_seat_schedule(self):
+        return self.__seat_schedule
 
     """
-    Swaps the order of the players. The order is changed in a way that guarantees that all combinations are considered
+    Swaps the order of the players, following the seat schedule. By default, all combinations are considered
     Example for 2 players [a,b]
         - iteration 1: a,b
         - iteration 2, b,a
@@ -64,9 +121,7 @@ class GameSimulator(ABC):
     """
 
     def change_player_positions(self):
-        self.__current_permutation += 1
-        if self.__current_permutation >= len(self.__permutations):
-            self.__current_permutation = 0
+        self.__seat_schedule.advance()
 
     """
     starts a new game
@@ -103,92 +158,383 @@ class GameSimulator(ABC):
 
 
     def get_player_positions(self):
-        return self.__permutations[self.__current_permutation]
+        return self.__seat_schedule.get_positions()
+
+    """
+    Sets how many game results are kept in the history returned by get_results (discarding the ones kept so far)
+    The score totals are always kept, whatever the history size
+    :param max_games: None keeps every result, 0 keeps none, and any other number keeps only the last results
+    :param spill_after: number of games after which the history is moved to memory-mapped files (None to never spill)
+    """
+    def set_history(self, max_games=None, spill_after=None):
+        names = [player.get_name() for player in self.__players]
+        self.__results = ResultStore(names, max_games, spill_after)
+
+    """
+    Sets the time the players have to choose their actions. A player that takes longer forfeits the game
+    The players get the deadline of each action before get_action is called (see Player.get_deadline)
+    :param move_time: seconds for each action (None for no limit)
+    :param game_time: seconds for all the actions of a player in a game, like a chess clock (None for no limit)
+    :param increment: seconds added to the game time of a player after each action
+    """
+    def set_time_control(self, move_time=None, game_time=None, increment=0.0):
+        self.__move_time = move_time
+        self.__game_time = game_time
+        self.__time_increment = increment
+
+    """
+    Sets what happens when a player returns an invalid action. The player is asked again, at most max_retries times
+    for each action, and then the policy is applied
+    :param max_retries: number of times a player is asked again for an action (None to ask until it is valid)
+    :param policy: 'forfeit' to end the game as a forfeit of the player, or 'random' to play a random valid action
+    """
+    def set_invalid_action_policy(self, max_retries=None, policy='forfeit'):
+        if policy not in INVALID_ACTION_POLICIES:
+            raise ValueError(f"Unknown invalid action policy '{policy}', it must be one of {INVALID_ACTION_POLICIES}")
+        self.__max_retries = max_retries
+        self.__invalid_action_policy = policy
+
+    """
+    Makes the games reproducible: each game gets its own random stream, derived from the seed and the index of the game,
+    so any game gives the same result whatever games were played before it (e.g. in another process)
+    The global random module is also seeded at the start of each game, so the players that use it are reproducible too
+    :param seed: the seed of the pairing (None to use the global random module, the default)
+    :param first_game: the index of the next game, to continue a sequence of games played elsewhere
+    """
+    def set_seed(self, seed, first_game: int = 0):
+        self.__seed = seed
+        self.__first_game = first_game - self.__num_games
+
+    """
+    Gets the random stream of the current game, which the simulators and the states must use for the randomness of the
+    game (e.g. shuffling the cards). Without a seed, it is the random module
+    """
+    def get_rng(self):
+        return self.__rng
+
+    """
+    Sets a sink (e.g. a GameLogWriter) that receives a record of each finished game, or None to stop sending them
+    """
+    def set_game_log(self, game_log):
+        self.__game_log = game_log
+
+    def get_game_log(self):
+        return self.__game_log
+
+    """
+    Sets an Instrumentation that records the time spent in each player callback and state operation, or None to stop
+    recording (the default, so the games are not slowed down)
+    """
+    def set_instrumentation(self, instrumentation):
+        self.__instrumentation = instrumentation
+
+    def get_instrumentation(self):
+        return self.__instrumentation
+
+    """
+    Creates a read-only view of the state for a player callback, instead of cloning the state
+    """
+    def __view(self, state):
+        view = StateView(state) if self.__instrumentation is None else TimedStateView(state, self.__instrumentation)
+        self.__views.add(view)
+        return view
+
+    """
+    Detaches the views that players kept, so they don't see the next changes to the state
+    It must be called before the state is changed
+    """
+    def __detach_views(self):
+        for view in self.__views:
+            view.detach()
+        self.__views.clear()
 
     """
     runs the simulation
     """
     def run_simulation(self):
-        state = self.on_init_game()
+        if self.__async_players:
+            raise TypeError(f"{self.__async_players[0].get_name()} has an async get_action, use run_simulation_async")
+
+        game = self.__play_game()
+        request = next(game)
+        while True:
+            # the references to the view are dropped before the game goes on, so the view doesn't need to be detached
+            player, view = request
+            request = None
+            action, error = None, None
+            try:
+                action = player.get_action(view)
+            except SandboxError as e:
+                # the game ends as a forfeit of the player (see __play_game)
+                error = e
+            view = None
+            try:
+                request = game.send(action) if error is None else game.throw(error)
+            except StopIteration:
+                break
+
+    """
+    runs the simulation, awaiting the players with an async get_action
+    The game is played exactly like in run_simulation, so many simulators (each with its own players) can play at
+    the same time in an event loop while their players wait for replies
+    """
+    async def run_simulation_async(self):
+        game = self.__play_game()
+        request = next(game)
+        while True:
+            player, view = request
+            request = None
+            action, error = None, None
+            try:
+                action = player.get_action(view)
+                if inspect.isawaitable(action):
+                    action = await action
+            except SandboxError as e:
+                error = e
+            view = None
+            try:
+                request = game.send(action) if error is None else game.throw(error)
+            except StopIteration:
+                break
+
+    """
+    Plays a game. It yields a (player, state view) pair each time a player must choose an action, and the action must
+    be sent back (see run_simulation and run_simulation_async)
+    """
+    def __play_game(self):
+        # with instrumentation, the callbacks are called through it so they are timed
+        instrumentation = self.__instrumentation
+        call = call_untimed if instrumentation is None else instrumentation.call
+
+        if self.__seed is not None:
+            game = self.__first_game + self.__num_games
+            self.__rng = random.Random(derive_seed(self.__seed, game))
+            random.seed(derive_seed(self.__seed, game, 'players'))
+
+        state = call(Instrumentation.SIMULATOR, 'on_init_game', self.on_init_game)
         players = self.get_player_positions()
+        names = [player.get_name() for player in players]
 
         # notify players a new game is starting
         for pos in range(0, len(players)):
             players[pos].set_current_pos(pos)
-            players[pos].event_new_game()
+            if self.__seed is not None:
+                # each player gets its own stream, also when it runs in another process (see SandboxedPlayer)
+                players[pos].seed_random(derive_seed(self.__seed, game, 'players', names[pos]))
+            if players[pos] in self.__listeners['event_new_game']:
+                call(names[pos], 'event_new_game', players[pos].event_new_game)
+
+        # the players that need to be notified of the actions, in seat order
+        action_listeners = [(player, name) for player, name in zip(players, names)
+                            if player in self.__listeners['event_action']]
+
+        # number of actions played in this game
+        num_actions = 0
+
+        # the encoded actions are only kept if the game log records them
+        actions = [] if self.__game_log is not None and self.__game_log.records_actions() else None
+
+        # the time left to each player in this game, with a game time control
+        clocks = None if self.__game_time is None else [self.__game_time] * len(players)
+        timed = self.__move_time is not None or clocks is not None
+
+        # the seat of the player that forfeited the game, if any
+        forfeit = None
+
+        action_type = self.get_action_type()
 
         # play a turn
         while not state.is_finished():
             selected_action = None
             pos = state.get_acting_player()
 
+            if timed:
+                budget = self.__get_move_budget(clocks, pos)
+                start = time.monotonic()
+                players[pos].set_deadline(start + budget)
+
             # obtain a valid action
+            retries = 0
             while True:
-                selected_action = players[pos].get_action(state.clone())
-                if state.validate_action(selected_action):
+                # get_action is called by the driver, so the time between the request and the reply is measured
+                start_ns = time.perf_counter_ns()
+                try:
+                    selected_action = yield players[pos], self.__view(state)
+                except SandboxError:
+                    # the sandbox of the player kept failing (see SandboxedPlayer), so the player loses the game
+                    forfeit = pos
+                    self.__forfeits[names[pos]]['crash'] += 1
+                    break
+                elapsed_ns = time.perf_counter_ns() - start_ns
+                if instrumentation is not None:
+                    instrumentation.record(names[pos], 'get_action', elapsed_ns)
+
+                # actions of other types (e.g. None) are invalid, and are not passed to validate_action
+                if isinstance(selected_action, action_type) and \
+                        call(Instrumentation.STATE, 'validate_action', state.validate_action, selected_action):
+                    break
+
+                invalid_actions = self.__invalid_actions[names[pos]]
+                invalid_actions['attempts'] += 1
+                invalid_actions['seconds'] += elapsed_ns / 1e9
+
+                if self.__max_retries is not None and retries >= self.__max_retries:
+                    if self.__invalid_action_policy == 'forfeit':
+                        forfeit = pos
+                        self.__forfeits[names[pos]]['invalid_action'] += 1
+                    else:
+                        selected_action = self.__rng.choice(list(state.get_possible_actions()))
+                    break
+                retries += 1
+
+            if forfeit is not None:
+                break
+
+            if timed:
+                elapsed = time.monotonic() - start
+                if elapsed > budget:
+                    forfeit = pos
+                    self.__forfeits[names[pos]]['timeout'] += 1
                     break
+                if clocks is not None:
+                    clocks[pos] += self.__time_increment - elapsed
 
-            state.play(selected_action)
+            self.__detach_views()
+            call(Instrumentation.STATE, 'play', state.play, selected_action)
+            num_actions += 1
+            if actions is not None:
+                actions.append(self.encode_action(selected_action))
 
             # notify players of the action
-            for player in players:
-                player.event_action(pos, selected_action, state.clone())
+            for player, name in action_listeners:
+                call(name, 'event_action', player.event_action, pos, selected_action, self.__view(state))
 
             # the simulator will run an optional hanlder for each updated state
-            self.on_state_update(state)
-
-        # handler to run before the game ends
-        self.on_before_end_game(state)
+            self.__detach_views()
+            if 'on_state_update' in self.__hooks:
+                call(Instrumentation.SIMULATOR, 'on_state_update', self.on_state_update, state)
+
+        if forfeit is None:
+            # handler to run before the game ends
+            if 'on_before_end_game' in self.__hooks:
+                call(Instrumentation.SIMULATOR, 'on_before_end_game', self.on_before_end_game, state)
+            scores = [state.get_result(pos) for pos in range(len(players))]
+        else:
+            scores = self.get_forfeit_scores(state, forfeit)
 
         result = {}
-        for player in players:
+        for player, name in zip(players, names):
             # notify the player of the result in each position
-            for pos in range(len(players)):
-                player.event_result(pos, state.get_result(pos))
+            if player in self.__listeners['event_result']:
+                for pos in range(len(players)):
+                    call(name, 'event_result', player.event_result, pos, scores[pos])
 
             # store the result for that player
-            result[player.get_name()] = state.get_result(player.get_current_pos())
-            player.event_end_game(state.clone())
+            result[name] = scores[player.get_current_pos()]
+            if player in self.__listeners['event_end_game']:
+                call(name, 'event_end_game', player.event_end_game, self.__view(state))
+        self.__detach_views()
+
+        for name, score in result.items():
+            self.__scores[name] += score
+        self.__num_games += 1
 
-        self.__results.append(result)
+        seats = {name: player.get_current_pos() for player, name in zip(players, names)}
+        self.__results.append(result, seats, num_actions)
+
+        if self.__game_log is not None:
+            self.__game_log.write_game(names, [result[name] for name in names], num_actions, actions)
 
         # handler to run after a game ends
-        self.on_end_game(state)
+        if 'on_end_game' in self.__hooks:
+            call(Instrumentation.SIMULATOR, 'on_end_game', self.on_end_game, state)
+
+    def __get_move_budget(self, clocks, pos):
+        budgets = []
+        if self.__move_time is not None:
+            budgets.append(self.__move_time)
+        if clocks is not None:
+            budgets.append(clocks[pos])
+        return max(min(budgets), 0.0)
+
+    """
+    The scores of a game forfeited by a player (e.g. for running out of time), in seat order
+    By default, each other player wins 1 and the player loses as much. Simulators override it when a game has other stakes
+    :param state: the state of the game when it was forfeited
+    :param pos: the seat of the player that forfeited the game
+    """
+    def get_forfeit_scores(self, state, pos):
+        num_players = len(self.get_players())
+        return [1 - num_players if seat == pos else 1 for seat in range(num_players)]
+
+    # gets the number of games forfeited by each player, by reason (e.g. {'a': {'timeout': 2}})
+    def get_forfeits(self):
+        return {name: dict(reasons) for name, reasons in self.__forfeits.items()}
+
+    # gets the number of invalid actions returned by each player and the seconds spent choosing them
+    # (e.g. {'a': {'attempts': 3, 'seconds': 0.01}})
+    def get_invalid_actions(self):
+        return {name: dict(invalid_actions) for name, invalid_actions in self.__invalid_actions.items()}
+
+    # gets the counters of each player (see Player.get_counters) during the games of this simulator
+    # (e.g. {'a': {'probes': 5000, 'hits': 1200, 'collisions': 80}})
+    def get_player_counters(self):
+        counters = {}
+        for player in self.__players:
+            name = player.get_name()
+            initial = self.__initial_counters[name]
+            player_counters = {key: value - initial.get(key, 0) for key, value in player.get_counters().items()}
+            if player_counters:
+                counters[name] = player_counters
+        return counters
 
     # prints the stats for all players
     def print_stats(self):
         scores = self.get_global_score()
-        for player in self.__permutations[0]:
+        for player in self.__players:
             name = player.get_name()
-            print(f"Player {name} | Total score: {scores[name]}$ | Avg. score per game: {scores[name] / len(self.__results)}$")
+            print(f"Player {name} | Total score: {scores[name]}$ | Avg. score per game: {scores[name] / self.__num_games}$")
+
+        # the stats kept by the players themselves (e.g. the transposition tables of the minimax players)
+        for player in self.__players:
+            player.print_stats()
+
+        if self.__instrumentation is not None:
+            self.__instrumentation.print_stats()
 
     # returns the list of players
     def get_players(self):
-        return self.__permutations[0]
+        return self.__players
 
     # returns the ordered list of players for the current permutation
     def get_player_positions(self):
-        return self.__permutations[self.__current_permutation]
+        return self.__seat_schedule.get_positions()
 
     # gets the number os players
     def num_players(self):
-        return len(self.__permutations[0])
+        return len(self.__players)
 
-    # gets the results of all games
+    # gets the number of games played so far
+    def get_num_games(self):
+        return self.__num_games
+
+    # gets the results of the games kept in the history, as a ResultStore
+    # each item is a dict with the score of each player, and the columns can be used as numpy arrays
     def get_results(self):
         return self.__results
 
     # gets the scores of all players
     def get_global_score(self):
-        scores = {}
-        for player in self.__permutations[0]:
-            name = player.get_name()
-            scores[name] = 0
-            for result in self.__results:
-                scores[name] += result[name]
-        return scores
+        return dict(self.__scores)
 
 
+    """
+    Encodes an action as an int, so it can be written to a game log
+    It must be overridden by the simulators whose game logs record the actions
+    """
+    def encode_action(self, action) -> int:
+        raise NotImplementedError(f"{self.__class__.__name__} can't encode actions")
+
     @staticmethod
     @abstractmethod
     def get_player_type():
@@ -202,4 +548,8 @@ class GameSimulator(ABC):
     @staticmethod
     @abstractmethod
     def get_action_type():
-        pass
\ No newline at end of file
+        pass
+
+
+def call_untimed(owner, callback, function, *args):
+    return function(*args)
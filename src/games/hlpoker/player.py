@@ -130,6 +130,15 @@ class HLPokerPlayer(Player, ABC):
     def get_opponent_cards(self):
         return self.__opponent_cards
 
+    """
+    event_action forwards the actions to event_my_action and event_opponent_action, so it is only needed if one of them is
+    """
+    @classmethod
+    def handles_event(cls, event: str) -> bool:
+        if event == 'event_action' and cls.event_action is HLPokerPlayer.event_action:
+            return cls.handles_event('event_my_action') or cls.handles_event('event_opponent_action')
+        return super().handles_event(event)
+
     def event_action(self, pos: int, action, new_state):
         if self.get_current_pos() == pos:
             self.event_my_action(action, new_state)
@@ -3,7 +3,6 @@ from games.hlpoker.action import HLPokerAction
 from games.hlpoker.state import HLPokerState
 from games.hlpoker.round import Round
 from phevaluator.evaluator import evaluate_cards
-from random import choice
 
 
 class SmartHLPokerPlayer(HLPokerPlayer):
@@ -16,7 +15,7 @@ class SmartHLPokerPlayer(HLPokerPlayer):
             return HLPokerAction.FOLD
 
         if len(private_cards) + len(board_cards) < 5:
-            return choice(possible_actions)
+            return self.get_rng().choice(possible_actions)
 
         hand_strength = self.evaluate_hand_strength(private_cards, board_cards)
 
@@ -35,14 +34,14 @@ class SmartHLPokerPlayer(HLPokerPlayer):
 
     def preflop_strategy(self, hand_strength, possible_actions):
         if hand_strength > 1000:
-            return choice([action for action in possible_actions if action != HLPokerAction.FOLD])
-        return choice(possible_actions)
+            return self.get_rng().choice([action for action in possible_actions if action != HLPokerAction.FOLD])
+        return self.get_rng().choice(possible_actions)
 
     def postflop_strategy(self, hand_strength, state, possible_actions):
         pot_odds = state.get_pot() / (state.get_spent(state.get_acting_player()) + 1)
         if hand_strength / pot_odds > 1.5:
-            return choice([action for action in possible_actions if action != HLPokerAction.FOLD])
-        return choice(possible_actions)
+            return self.get_rng().choice([action for action in possible_actions if action != HLPokerAction.FOLD])
+        return self.get_rng().choice(possible_actions)
 
     def event_my_action(self, action, new_state):
         pass
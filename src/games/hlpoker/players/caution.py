@@ -3,7 +3,6 @@ from games.hlpoker.action import HLPokerAction
 from games.hlpoker.state import HLPokerState
 from games.hlpoker.round import Round
 from phevaluator.evaluator import evaluate_cards
-from random import choice
 
 
 class CautiousHLPokerPlayer(HLPokerPlayer):
@@ -36,7 +35,7 @@ class CautiousHLPokerPlayer(HLPokerPlayer):
     def cautious_choice(self, possible_actions):
         if HLPokerAction.FOLD in possible_actions:
             return HLPokerAction.FOLD
-        return choice([action for action in possible_actions if action != HLPokerAction.RAISE])
+        return self.get_rng().choice([action for action in possible_actions if action != HLPokerAction.RAISE])
 
     def preflop_strategy(self, hand_strength, possible_actions):
         # Cautious preflop strategy, avoid raising
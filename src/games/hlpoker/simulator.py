@@ -1,5 +1,3 @@
-from random import shuffle
-
 from termcolor import cprint
 
 from games.game_simulator import GameSimulator
@@ -15,9 +13,13 @@ class HLPokerSimulator(GameSimulator):
     def __init__(self, players: list[HLPokerPlayer]):
         super().__init__(players)
         """
+        the cards in a fixed order, so the shuffle of a game only depends on the random stream of the game
+        """
+        self.__cards = [Card(rank, suit) for suit in Suit for rank in Rank]
+        """
         deck of cards
         """
-        self.__deck = [Card(rank, suit) for suit in Suit for rank in Rank]
+        self.__deck = list(self.__cards)
         """
         stores the current round of the current game being simulated
         """
@@ -29,7 +31,8 @@ class HLPokerSimulator(GameSimulator):
 
     def on_init_game(self):
         # shuffle the deck
-        shuffle(self.__deck)
+        self.__deck = list(self.__cards)
+        self.get_rng().shuffle(self.__deck)
 
         self.__used_card_count = 0
         self.__current_round = Round.Preflop
@@ -77,10 +80,18 @@ class HLPokerSimulator(GameSimulator):
         state.compute_results(self.__deck[0:2], self.__deck[2:4], self.__deck[4:9])
 
 
+    def get_forfeit_scores(self, state: HLPokerState, pos):
+        # a forfeit is like a fold: the player loses what it bet so far
+        spent = state.get_spent(pos)
+        return [-spent if seat == pos else spent for seat in range(state.get_num_players())]
+
     def on_end_game(self, state: HLPokerState):
         # ignored for this simulator
         pass
 
+    def encode_action(self, action: HLPokerAction) -> int:
+        return action.value
+
     @staticmethod
     def get_player_type():
         return HLPokerPlayer
@@ -7,6 +7,7 @@ from phevaluator.evaluator import evaluate_cards
 class HLPokerState(State):
     BET_SIZE = 1.0
     MAX_RAISES = 4
+    MUTATING_METHODS = State.MUTATING_METHODS + ('compute_results',)
 
     def __init__(self, num_players: int):
         super().__init__()
@@ -0,0 +1,165 @@
+import json
+import time
+
+from games.state_view import StateView
+
+
+class TimingHistogram:
+    """
+    A histogram of durations with power of 2 buckets (in nanoseconds), so recording a duration is a single increment
+    The percentiles are estimated from the buckets, so they are accurate within a factor of 2
+    """
+
+    NUM_BUCKETS = 64
+
+    def __init__(self):
+        self.__buckets = [0] * TimingHistogram.NUM_BUCKETS
+        self.__count = 0
+        self.__total_ns = 0
+        self.__max_ns = 0
+
+    def add(self, duration_ns: int):
+        # the bucket b holds the durations in [2^(b-1), 2^b) ns
+        self.__buckets[min(duration_ns.bit_length(), TimingHistogram.NUM_BUCKETS - 1)] += 1
+        self.__count += 1
+        self.__total_ns += duration_ns
+        if duration_ns > self.__max_ns:
+            self.__max_ns = duration_ns
+
+    def get_count(self):
+        return self.__count
+
+    def get_total_seconds(self):
+        return self.__total_ns / 1e9
+
+    def get_mean_seconds(self):
+        return 0.0 if self.__count == 0 else self.__total_ns / self.__count / 1e9
+
+    def get_max_seconds(self):
+        return self.__max_ns / 1e9
+
+    """
+    Estimates a percentile, as the upper bound of the bucket where it falls
+    :param percentile: between 0 and 100
+    """
+    def get_percentile_seconds(self, percentile: float):
+        if self.__count == 0:
+            return 0.0
+        rank = max(1, round(percentile / 100 * self.__count))
+        seen = 0
+        for bucket, count in enumerate(self.__buckets):
+            seen += count
+            if seen >= rank:
+                return min(2 ** bucket, self.__max_ns) / 1e9
+        return self.__max_ns / 1e9
+
+    def to_dict(self):
+        last_bucket = max((bucket for bucket, count in enumerate(self.__buckets) if count > 0), default=-1)
+        return {
+            'count': self.__count,
+            'total_s': self.get_total_seconds(),
+            'mean_s': self.get_mean_seconds(),
+            'p50_s': self.get_percentile_seconds(50),
+            'p99_s': self.get_percentile_seconds(99),
+            'max_s': self.get_max_seconds(),
+            # upper bounds of the buckets in ns, and their counts
+            'buckets': {2 ** bucket: count for bucket, count in enumerate(self.__buckets[:last_bucket + 1]) if count > 0}
+        }
+
+
+class Instrumentation:
+    """
+    Records how long the simulators spend in each player callback (get_action, the events) and in the operations on the
+    game states (validate_action, play, the clones requested by the players and the detached views), and in the hooks
+    of the simulator itself. It is opt-in (see GameSimulator.set_instrumentation): without it, nothing is measured
+    The same instance can be shared by many simulators, the timings are kept by player name
+    """
+
+    """
+    The owner of the timings of the simulator hooks and of the state operations
+    """
+    SIMULATOR = 'simulator'
+    STATE = 'state'
+
+    def __init__(self):
+        # owner (a player name, SIMULATOR or STATE) -> callback or operation -> TimingHistogram
+        self.__histograms = {}
+
+    def __get_histogram(self, owner, callback):
+        histograms = self.__histograms.get(owner)
+        if histograms is None:
+            histograms = self.__histograms[owner] = {}
+        histogram = histograms.get(callback)
+        if histogram is None:
+            histogram = histograms[callback] = TimingHistogram()
+        return histogram
+
+    """
+    Records a duration measured elsewhere (e.g. a get_action, which is called by the driver of the simulation)
+    """
+    def record(self, owner: str, callback: str, duration_ns: int):
+        self.__get_histogram(owner, callback).add(duration_ns)
+
+    """
+    Calls a function and records how long it took
+    :param owner: a player name, SIMULATOR or STATE
+    :param callback: the name of the callback or operation (e.g. 'event_action')
+    """
+    def call(self, owner: str, callback: str, function, *args):
+        start = time.perf_counter_ns()
+        try:
+            return function(*args)
+        finally:
+            self.__get_histogram(owner, callback).add(time.perf_counter_ns() - start)
+
+    def get_histograms(self):
+        return self.__histograms
+
+    def to_dict(self):
+        return {owner: {callback: histogram.to_dict() for callback, histogram in sorted(histograms.items())}
+                for owner, histograms in sorted(self.__histograms.items())}
+
+    """
+    Writes the timings to a JSON file
+    """
+    def save(self, path: str):
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+    def print_stats(self):
+        print(f"{'Timings':<40} | {'calls':>9} | {'total':>9} | {'mean':>9} | {'p50':>9} | {'p99':>9} | {'max':>9}")
+        for owner, histograms in sorted(self.__histograms.items()):
+            for callback, histogram in sorted(histograms.items()):
+                print(f"{owner + '.' + callback:<40} | {histogram.get_count():>9} | "
+                      f"{format_seconds(histogram.get_total_seconds()):>9} | "
+                      f"{format_seconds(histogram.get_mean_seconds()):>9} | "
+                      f"{format_seconds(histogram.get_percentile_seconds(50)):>9} | "
+                      f"{format_seconds(histogram.get_percentile_seconds(99)):>9} | "
+                      f"{format_seconds(histogram.get_max_seconds()):>9}")
+
+
+def format_seconds(seconds):
+    if seconds >= 1:
+        return f"{seconds:.2f}s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds * 1e6:.1f}us"
+
+
+class TimedStateView(StateView):
+    """
+    A StateView that records the clones requested by the players and the clones made to detach it
+    """
+
+    def __init__(self, state, instrumentation: Instrumentation):
+        super().__init__(state)
+        self.__instrumentation = instrumentation
+
+    def clone(self):
+        return self.__instrumentation.call(Instrumentation.STATE, 'clone', super().clone)
+
+    def detach(self):
+        instrumentation = self.__instrumentation
+        instrumentation.call(Instrumentation.STATE, 'detach', super().detach)
+        # detach drops the attributes kept in the view
+        self.__instrumentation = instrumentation
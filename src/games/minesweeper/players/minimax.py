@@ -3,6 +3,7 @@ from games.minesweeper.player import MinesweeperPlayer
 from games.minesweeper.state import MinesweeperState
 from random import choice
 from games.state import State
+from games.search import iterative_deepening
 import random
 
 class MinimaxMinesweeperPlayer(MinesweeperPlayer):
@@ -12,10 +13,16 @@ class MinimaxMinesweeperPlayer(MinesweeperPlayer):
 
     def get_action(self, state: MinesweeperState):
         # Start the Minimax algorithm and return the best action
-        _, action = self.minimax(state, self.depth, True, float('-inf'), float('inf'))
-        return action
+        def search(depth):
+            _, action = self.minimax(state, depth, True, float('-inf'), float('inf'))
+            return action
+
+        # with a time control, the deepest search that finished in time is used
+        action = iterative_deepening(self, search, self.depth)
+        return action if action is not None else next(iter(state.get_possible_actions()))
 
     def minimax(self, state, depth, maximizing_player, alpha, beta):
+        self.check_deadline()
         if depth == 0 or state.is_finished():
             return self.evaluate(state), None
 
@@ -1,4 +1,4 @@
-from random import randint, choice
+from random import randint
 
 from games.minesweeper.action import MinesweeperAction
 from games.minesweeper.player import MinesweeperPlayer
@@ -12,7 +12,7 @@ class RandomMinesweeperPlayer(MinesweeperPlayer):
         super().__init__(name)
 
     def get_action(self, state: MinesweeperState):
-        return choice(list(state.get_possible_actions()))
+        return self.get_rng().choice(list(state.get_possible_actions()))
 
     def event_action(self, pos: int, action, new_state: State):
         # ignore
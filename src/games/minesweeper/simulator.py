@@ -15,7 +15,7 @@ class MinesweeperSimulator(GameSimulator):
         self.__num_cols = num_cols
 
     def on_init_game(self):
-        return MinesweeperState(self.__num_rows, self.__num_cols)
+        return MinesweeperState(self.__num_rows, self.__num_cols, rng=self.get_rng())
 
     def on_before_end_game(self, state: MinesweeperState):
         # ignored for this simulator
@@ -29,6 +29,9 @@ class MinesweeperSimulator(GameSimulator):
         # ignored for this simulator
         pass
 
+    def encode_action(self, action: MinesweeperAction) -> int:
+        return action.get_row() * self.__num_cols + action.get_col()
+
     @staticmethod
     def get_player_type():
         return MinesweeperPlayer
@@ -11,7 +11,11 @@ class MinesweeperState(State):
     EMPTY_CELL = -1
     MINE_CELL = -2
 
-    def __init__(self, num_rows: int = 7, num_cols: int = 7, num_mines: int = 11):
+    """
+    :param rng: the random stream used to place the mines (e.g. GameSimulator.get_rng), the random module by default
+    :param mines: the cells of the mines, when they are already known (e.g. in a clone)
+    """
+    def __init__(self, num_rows: int = 7, num_cols: int = 7, num_mines: int = 11, rng=None, mines=None):
         super().__init__()
 
         if num_rows < 4:
@@ -33,15 +37,15 @@ class MinesweeperState(State):
         """
         self.__grid = [[MinesweeperState.EMPTY_CELL for _i in range(self.__num_cols)] for _j in range(self.__num_rows)]
         self.__grid_players = [[MinesweeperState.EMPTY_CELL for _i in range(self.__num_cols)] for _j in range(self.__num_rows)]
-        self.__mines = self.__place_mines()
+        self.__mines = self.__place_mines(random if rng is None else rng) if mines is None else set(mines)
         self.__acting_player = 0
         self.__mines_hit = [0, 0]
         self.__has_winner = False
 
-    def __place_mines(self):
+    def __place_mines(self, rng):
         mines = set()
         while len(mines) < self.__num_mines:
-            mine = (random.randint(0, self.__num_rows - 1), random.randint(0, self.__num_cols - 1))
+            mine = (rng.randint(0, self.__num_rows - 1), rng.randint(0, self.__num_cols - 1))
             mines.add(mine)
         return mines
 
@@ -136,11 +140,8 @@ class MinesweeperState(State):
         return self.__acting_player
 
     def clone(self):
-        cloned_state = MinesweeperState(self.__num_rows, self.__num_cols)
-        cloned_state.__num_rows = self.__num_rows
-        cloned_state.__num_cols = self.__num_cols
-        cloned_state.__num_mines = self.__num_mines
-        cloned_state.__mines = self.__mines.copy()
+        # the mines are copied, so the clone doesn't place new ones
+        cloned_state = MinesweeperState(self.__num_rows, self.__num_cols, self.__num_mines, mines=self.__mines)
         cloned_state.__acting_player = self.__acting_player
         cloned_state.__mines_hit = self.__mines_hit.copy()
         cloned_state.__has_winner = self.__has_winner
@@ -1,10 +1,22 @@
+import random
+import time
 from abc import ABC, abstractmethod
 
+from games.callbacks import is_noop
+from games.search import SearchTimeout
 from games.state import State
 
 
 class Player(ABC):
 
+    """
+    The time left before the deadline when check_deadline stops the search, to return the action in time: a share of
+    the time of the action, so pauses like the garbage collection don't make the player lose on time, and at least some
+    seconds
+    """
+    DEADLINE_MARGIN_RATIO = 0.2
+    DEADLINE_MARGIN = 0.005
+
     """
     :param name: name of the player (simply a text identifier for the player)
     """
@@ -16,6 +28,14 @@ class Player(ABC):
         # in most games, the first player takes the position 0
         self.__current_pos = None
 
+        # the time (see time.monotonic) by which the current action must be returned, or None without time control
+        self.__deadline = None
+        # the time at which the searches stop, a margin before the deadline
+        self.__stop_time = None
+
+        # the random stream of the current game (see seed_random), the random module itself until it is seeded
+        self.__rng = random
+
     """
     retrieves the name of the player
     """
@@ -35,6 +55,70 @@ class Player(ABC):
     def set_current_pos(self, new_pos):
         self.__current_pos = new_pos
 
+    """
+    Seeds the randomness of the player for a game (the simulator calls it before event_new_game when it has a seed, see
+    GameSimulator.set_seed): get_rng gives a stream of its own from then on
+    :param seed: the seed of the player for the game
+    """
+    def seed_random(self, seed):
+        self.__rng = random.Random(seed)
+
+    """
+    retrieves the random stream the player must use (e.g. get_rng().choice(actions)), so its games can be reproduced
+    with a seed wherever the player runs. Without a seed, it is the random module
+    """
+    def get_rng(self):
+        return self.__rng
+
+    """
+    retrieves the time (see time.monotonic) by which the current action must be returned, or None without time control
+    """
+    def get_deadline(self):
+        return self.__deadline
+
+    """
+    sets the deadline of the current action (the simulator sets it before calling get_action)
+    :param deadline: the time (see time.monotonic), or None without time control
+    """
+    def set_deadline(self, deadline):
+        self.__deadline = deadline
+        if deadline is None:
+            self.__stop_time = None
+        else:
+            budget = max(deadline - time.monotonic(), 0.0)
+            self.__stop_time = deadline - max(self.DEADLINE_MARGIN, self.DEADLINE_MARGIN_RATIO * budget)
+
+    """
+    retrieves the time (see time.monotonic) at which the searches must stop to return the current action in time,
+    a margin before the deadline (see DEADLINE_MARGIN_RATIO), or None without time control
+    """
+    def get_stop_time(self):
+        return self.__stop_time
+
+    """
+    retrieves the seconds left to return the current action, or None without time control
+    """
+    def get_time_left(self):
+        return None if self.__deadline is None else max(self.__deadline - time.monotonic(), 0.0)
+
+    """
+    Raises a SearchTimeout if the deadline of the current action is (almost) over
+    Searches call it regularly to stop in time, see games.search.iterative_deepening
+    """
+    def check_deadline(self):
+        if self.__stop_time is not None and time.monotonic() >= self.__stop_time:
+            raise SearchTimeout()
+
+    """
+    Checks if the player needs to be notified of an event, so the simulator can skip the events that it ignores
+    By default, an event is needed unless the class implements it with an empty body (e.g. only `pass`)
+    Player classes can override this method to declare the events they need
+    :param event: the name of the event method (e.g. 'event_action')
+    """
+    @classmethod
+    def handles_event(cls, event: str) -> bool:
+        return not is_noop(getattr(cls, event))
+
     """
     prints to the console the stats of the player
     """
@@ -42,8 +126,25 @@ class Player(ABC):
     def print_stats(self):
         pass
 
+    """
+    Gets the counters kept by the player since it was created (e.g. the lookups of its transposition table), by name
+    The tournaments add them up over the games of each pairing, even when they are played in other processes, and
+    print them with print_counters
+    """
+    def get_counters(self) -> dict:
+        return {}
+
+    """
+    prints to the console the counters of a player (see get_counters), added up over the games of a pairing
+    """
+    @classmethod
+    def print_counters(cls, name: str, counters: dict):
+        pass
+
     """
     Method that returns an action for a certain game state
+    It can also be a coroutine (async def), for players that wait on other processes, but then the games must be
+    played with GameSimulator.run_simulation_async (see --async-lanes)
     :param state: the current game state
     """
     @abstractmethod
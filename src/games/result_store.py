@@ -0,0 +1,195 @@
+import mmap
+import tempfile
+from array import array
+
+
+class ResultColumn:
+    """
+    A growable column of typed values (see the array module for the type codes)
+    The values are kept in memory until the column is spilled, after that they live in a memory-mapped temporary file
+    """
+
+    def __init__(self, typecode: str, capacity: int = 1024, fixed_capacity: bool = False):
+        self.__typecode = typecode
+        self.__itemsize = array(typecode).itemsize
+
+        """
+        a fixed capacity column is used as a ring buffer that only keeps the last values
+        """
+        self.__fixed_capacity = fixed_capacity
+
+        """
+        number of values ever appended to the column
+        """
+        self.__count = 0
+
+        """
+        temporary file backing the column once it was spilled
+        """
+        self.__file = None
+
+        self.__values = memoryview(bytearray(max(capacity, 1) * self.__itemsize)).cast(typecode)
+
+    def __len__(self):
+        return min(self.__count, len(self.__values)) if self.__fixed_capacity else self.__count
+
+    def __allocate(self, capacity):
+        size = capacity * self.__itemsize
+        if self.__file is None:
+            return memoryview(bytearray(size)).cast(self.__typecode)
+        self.__file.truncate(size)
+        return memoryview(mmap.mmap(self.__file.fileno(), size)).cast(self.__typecode)
+
+    """
+    Moves the values to a bigger buffer. The old buffer is never resized, so views that were handed out stay valid
+    """
+    def __resize(self, capacity):
+        values = self.__allocate(capacity)
+        values[:len(self)] = self.__values[:len(self)]
+        self.__values = values
+
+    def append(self, value):
+        if self.__fixed_capacity:
+            self.__values[self.__count % len(self.__values)] = value
+        else:
+            if self.__count == len(self.__values):
+                self.__resize(2 * self.__count)
+            self.__values[self.__count] = value
+        self.__count += 1
+
+    """
+    Moves the column to a memory-mapped temporary file
+    :param directory: the directory of the temporary file (the system default if None)
+    """
+    def spill(self, directory=None):
+        if self.__file is not None:
+            return
+        self.__file = tempfile.TemporaryFile(dir=directory)
+        self.__resize(len(self.__values))
+
+    def is_spilled(self):
+        return self.__file is not None
+
+    """
+    Gets a read-only memoryview of the values, from the oldest to the newest
+    It can be used directly by numpy (e.g. numpy.asarray(column.view()))
+    """
+    def view(self):
+        if self.__fixed_capacity and self.__count > len(self.__values):
+            # the ring buffer wrapped around, so the values are copied in chronological order
+            start = self.__count % len(self.__values)
+            ordered = array(self.__typecode, self.__values[start:])
+            ordered.extend(self.__values[:start])
+            return memoryview(ordered).toreadonly()
+        return self.__values[:len(self)].toreadonly()
+
+    def __getitem__(self, index):
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("result column index out of range")
+        if self.__fixed_capacity and self.__count > len(self.__values):
+            index = (self.__count + index) % len(self.__values)
+        return self.__values[index]
+
+
+class ResultStore:
+    """
+    A compact, columnar store for the results of the games of a simulator
+    For each player it keeps one typed column with the score, one with the seat and one with the result code,
+    and for each game it keeps the game length (number of actions)
+    """
+
+    RESULT_LOSS = -1
+    RESULT_DRAW = 0
+    RESULT_WIN = 1
+
+    """
+    :param player_names: the names of the players in the games
+    :param max_games: None keeps every result, 0 keeps none, and any other number keeps only the last results
+    :param spill_after: number of games after which the store is moved to memory-mapped files (None to never spill)
+    :param spill_dir: the directory of the memory-mapped files (the system temporary directory if None)
+    """
+    def __init__(self, player_names, max_games=None, spill_after=None, spill_dir=None):
+        self.__player_names = list(player_names)
+        self.__max_games = max_games
+        self.__spill_after = spill_after
+        self.__spill_dir = spill_dir
+
+        fixed_capacity = max_games is not None
+        capacity = max_games if fixed_capacity else 1024
+
+        self.__scores = {name: ResultColumn('d', capacity, fixed_capacity) for name in self.__player_names}
+        self.__seats = {name: ResultColumn('b', capacity, fixed_capacity) for name in self.__player_names}
+        self.__codes = {name: ResultColumn('b', capacity, fixed_capacity) for name in self.__player_names}
+        self.__lengths = ResultColumn('I', capacity, fixed_capacity)
+
+    def __columns(self):
+        yield self.__lengths
+        for name in self.__player_names:
+            yield self.__scores[name]
+            yield self.__seats[name]
+            yield self.__codes[name]
+
+    """
+    Stores the result of a game
+    :param scores: the score of each player (by name)
+    :param seats: the seat of each player (by name)
+    :param length: the number of actions in the game
+    """
+    def append(self, scores: dict, seats: dict, length: int):
+        if self.__max_games == 0:
+            return
+
+        for name in self.__player_names:
+            score = scores[name]
+            self.__scores[name].append(score)
+            self.__seats[name].append(seats[name])
+            self.__codes[name].append(ResultStore.get_result_code(score))
+        self.__lengths.append(length)
+
+        if self.__spill_after is not None and not self.is_spilled() and len(self) >= self.__spill_after:
+            for column in self.__columns():
+                column.spill(self.__spill_dir)
+
+    @staticmethod
+    def get_result_code(score):
+        if score > 0:
+            return ResultStore.RESULT_WIN
+        if score < 0:
+            return ResultStore.RESULT_LOSS
+        return ResultStore.RESULT_DRAW
+
+    def is_spilled(self):
+        return self.__lengths.is_spilled()
+
+    def __len__(self):
+        return len(self.__lengths)
+
+    """
+    A single game result, with the same format used by the simulator before: a dict with the score of each player
+    """
+    def __getitem__(self, index):
+        return {name: self.__scores[name][index] for name in self.__player_names}
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def get_player_names(self):
+        return self.__player_names
+
+    # the following methods return read-only memoryviews, that can be used directly by numpy
+
+    def get_scores(self, name):
+        return self.__scores[name].view()
+
+    def get_seats(self, name):
+        return self.__seats[name].view()
+
+    def get_result_codes(self, name):
+        return self.__codes[name].view()
+
+    def get_lengths(self):
+        return self.__lengths.view()
@@ -0,0 +1,9 @@
+import hashlib
+
+"""
+Derives a 64-bit seed from a sequence of keys (e.g. a base seed, the names in a pairing and a shard index).
+Different keys give unrelated seeds, so every derived seed can be used as an independent random stream.
+"""
+def derive_seed(*keys) -> int:
+    digest = hashlib.sha256("/".join(str(key) for key in keys).encode()).digest()
+    return int.from_bytes(digest[:8], "big")
@@ -0,0 +1,240 @@
+import math
+import multiprocessing
+import pickle
+import random
+import sys
+
+from games.player import Player
+
+try:
+    import resource
+except ImportError:
+    # the limits are only available on POSIX systems
+    resource = None
+
+
+class SandboxError(RuntimeError):
+    pass
+
+
+"""
+Methods that are sent to the worker without waiting for it to finish, so they don't cost a round trip
+Any failure they cause is found in the next call that waits for a reply
+"""
+NO_REPLY_METHODS = ('set_current_pos', 'start_new_game', 'set_deadline', 'seed_random', 'reset_cpu_limit')
+
+
+def is_no_reply(method):
+    return method.startswith('event_') or method in NO_REPLY_METHODS
+
+"""
+Limits the CPU time of the worker process to cpu_seconds more than it has used so far
+Only the soft limit is set, so it can be moved forward for each game, and going over it stops the process (SIGXCPU)
+"""
+def set_cpu_limit(cpu_seconds):
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    # the limit is in whole seconds, so the game gets at least cpu_seconds
+    used = math.ceil(usage.ru_utime + usage.ru_stime)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = used + cpu_seconds
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+"""
+The entry point of a sandbox worker process: it builds the player and runs the calls it receives until it gets None
+An exception ends the process, and the SandboxedPlayer restarts it
+"""
+def run_sandbox_worker(connection, player_class, name, cpu_seconds, memory_bytes):
+    if resource is not None:
+        if cpu_seconds is not None:
+            set_cpu_limit(cpu_seconds)
+        if memory_bytes is not None:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+
+    try:
+        player = player_class(name)
+        for method, args in iter(connection.recv, None):
+            if method == 'reset_cpu_limit':
+                # the limit is for each game, not for the whole life of the worker
+                if resource is not None and cpu_seconds is not None:
+                    set_cpu_limit(cpu_seconds)
+                continue
+            if method == 'seed_random':
+                # the simulator seeds the global random module of its own process, this one is seeded here
+                random.seed(*args)
+            result = getattr(player, method)(*args)
+            if not is_no_reply(method):
+                connection.send(result)
+    except Exception as e:
+        print(f"Sandbox of {name} stopped: {e.__class__.__name__}: {e}", file=sys.stderr)
+
+
+class SandboxedPlayer(Player):
+    """
+    Hosts a player in a long-lived worker process, so a player that crashes, hangs or leaks memory can't take down
+    the simulation. The calls go through a pipe, and the game states are sent as pickled copies
+    Only the calls that return something (e.g. get_action) wait for the worker: the events are pipelined
+    When the worker fails (an exception, a timeout or a limit), it is restarted and the calls of the current game are
+    replayed, so the player gets back to the same game state before the call is tried again. The calls are kept
+    pickled, so the states they got can change after the call (e.g. detached views) and are only pickled once
+    """
+
+    """
+    :param player_class: the class of the hosted player
+    :param name: the name of the player
+    :param timeout: seconds to wait for a reply before the worker is considered stuck (None to wait forever)
+    :param cpu_seconds: CPU time limit of the worker process in each game (None for no limit)
+    :param memory_bytes: address space limit of each worker process (None for no limit)
+    :param max_restarts: number of restarts in a row after which a call fails with a SandboxError
+    """
+    def __init__(self, player_class, name, timeout=None, cpu_seconds=None, memory_bytes=None, max_restarts=3):
+        super().__init__(name)
+        self.__player_class = player_class
+        self.__timeout = timeout
+        self.__cpu_seconds = cpu_seconds
+        self.__memory_bytes = memory_bytes
+        self.__max_restarts = max_restarts
+
+        # the events that the hosted player needs, the others are not sent to the worker
+        self.__events = {event for event in ('event_new_game', 'event_action', 'event_result', 'event_end_game')
+                         if player_class.handles_event(event)}
+
+        # the pickled calls without reply of the current game, which are replayed when the worker is restarted
+        self.__game_calls = []
+
+        # the last counters received from the worker, and the ones of the workers before it, which a restart resets
+        self.__last_counters = {}
+        self.__counters_offset = {}
+
+        # number of times the worker was restarted
+        self.__restarts = 0
+
+        self.__process = None
+        self.__connection = None
+        self.__start()
+
+    def get_player_class(self):
+        return self.__player_class
+
+    def get_restarts(self):
+        return self.__restarts
+
+    def __start(self):
+        self.__connection, worker_connection = multiprocessing.Pipe()
+        self.__process = multiprocessing.Process(
+            target=run_sandbox_worker, daemon=True,
+            args=(worker_connection, self.__player_class, self.get_name(), self.__cpu_seconds, self.__memory_bytes))
+        self.__process.start()
+        worker_connection.close()
+
+    def __restart(self):
+        self.__stop()
+        self.__restarts += 1
+        # the new worker counts from zero, so the counters keep adding up from the last ones received
+        self.__counters_offset = self.__add_offset(self.__last_counters)
+        self.__last_counters = {}
+        self.__start()
+        for message in self.__game_calls:
+            self.__connection.send_bytes(message)
+
+    def __stop(self):
+        if self.__process is None:
+            return
+        self.__process.kill()
+        self.__process.join()
+        self.__connection.close()
+        self.__process = None
+
+    """
+    Stops the worker process
+    """
+    def close(self):
+        if self.__process is not None and self.__process.is_alive():
+            try:
+                self.__connection.send(None)
+            except OSError:
+                pass
+        self.__stop()
+
+    def __call(self, method, *args):
+        # pickled as the worker's connection.recv unpickles it
+        message = pickle.dumps((method, args), protocol=pickle.HIGHEST_PROTOCOL)
+        if is_no_reply(method):
+            self.__game_calls.append(message)
+            try:
+                self.__connection.send_bytes(message)
+            except OSError:
+                # the worker died, the call is replayed when it is restarted
+                self.__restart()
+            return None
+
+        for attempt in range(self.__max_restarts + 1):
+            try:
+                self.__connection.send_bytes(message)
+                if self.__connection.poll(self.__timeout):
+                    return self.__connection.recv()
+            except (OSError, EOFError):
+                pass
+            if attempt < self.__max_restarts:
+                self.__restart()
+
+        # the worker is stopped, so a late reply can't be taken for the reply of a later call, and the next call
+        # restarts it
+        self.__stop()
+        raise SandboxError(f"{self.get_name()} failed {self.__max_restarts + 1} times in a row calling {method}")
+
+    def __getattr__(self, name):
+        # the methods of specific player types (e.g. start_new_game of the HLPokerPlayer) are forwarded to the worker
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return lambda *args: self.__call(name, *args)
+
+    def set_current_pos(self, new_pos):
+        super().set_current_pos(new_pos)
+        self.__call('set_current_pos', new_pos)
+
+    def seed_random(self, seed):
+        # the worker has its own global random module, which is seeded there too (see run_sandbox_worker)
+        super().seed_random(seed)
+        self.__call('seed_random', seed)
+
+    def set_deadline(self, deadline):
+        # the deadline is on the monotonic clock, which is the same in the worker process
+        super().set_deadline(deadline)
+        self.__call('set_deadline', deadline)
+
+    def print_stats(self):
+        self.__call('print_stats')
+
+    def __add_offset(self, counters):
+        return {key: self.__counters_offset.get(key, 0) + counters.get(key, 0)
+                for key in self.__counters_offset.keys() | counters.keys()}
+
+    def get_counters(self):
+        counters = self.__call('get_counters')
+        self.__last_counters = counters
+        return self.__add_offset(counters)
+
+    def get_action(self, state):
+        return self.__call('get_action', state)
+
+    def event_new_game(self):
+        if self.__cpu_seconds is not None:
+            self.__call('reset_cpu_limit')
+        if 'event_new_game' in self.__events:
+            self.__call('event_new_game')
+
+    def event_action(self, pos: int, action, new_state):
+        if 'event_action' in self.__events:
+            self.__call('event_action', pos, action, new_state)
+
+    def event_result(self, pos: int, result):
+        if 'event_result' in self.__events:
+            self.__call('event_result', pos, result)
+
+    def event_end_game(self, final_state):
+        if 'event_end_game' in self.__events:
+            self.__call('event_end_game', final_state)
+        # the next game starts from scratch
+        self.__game_calls.clear()
@@ -0,0 +1,36 @@
+import time
+
+
+class SearchTimeout(Exception):
+    """
+    Raised by Player.check_deadline when the time to choose an action is over
+    """
+    pass
+
+
+"""
+Runs an anytime search with iterative deepening: search(1), search(2), ... search(max_depth), while the player has time
+The search must call player.check_deadline() regularly, so a depth that can't finish in time is abandoned
+Without a deadline (no time control), only search(max_depth) runs, so the player behaves like a fixed depth search,
+unless the search has a budget of its own (e.g. a number of nodes) and raises a SearchTimeout when it is spent
+:param player: the player that is searching (see Player.get_deadline)
+:param search: a function that searches up to a depth and returns its result (e.g. the best action)
+:param max_depth: the deepest search
+:param budgeted: whether the search stops itself, so it deepens even without a deadline
+:return: the result of the deepest search that finished, or None if none finished
+"""
+def iterative_deepening(player, search, max_depth: int, budgeted: bool = False):
+    if player.get_deadline() is None and not budgeted:
+        return search(max_depth)
+
+    result = None
+    for depth in range(1, max_depth + 1):
+        try:
+            result = search(depth)
+        except SearchTimeout:
+            break
+
+        # a deeper search would not finish either
+        if player.get_stop_time() is not None and time.monotonic() >= player.get_stop_time():
+            break
+    return result
@@ -0,0 +1,172 @@
+import math
+from abc import ABC, abstractmethod
+
+
+class SeatSchedule(ABC):
+    """
+    Decides the seats of the players in each game. The arrangements are generated on demand, one at a time, and the
+    schedule goes back to the first one after the last one
+    """
+
+    def __init__(self, players: list):
+        self.__players = list(players)
+        self.__index = 0
+
+    def get_players(self):
+        return self.__players
+
+    """
+    Gets the players in seat order for the current game
+    """
+    @abstractmethod
+    def get_positions(self):
+        pass
+
+    """
+    Moves to the arrangement of the next game
+    """
+    def advance(self):
+        self.__index += 1
+        if self.__index >= self.get_num_arrangements():
+            self.__index = 0
+            self.on_restart()
+        else:
+            self.on_advance(self.__index)
+
+    """
+    Gets the index of the current arrangement
+    """
+    def get_index(self):
+        return self.__index
+
+    """
+    Gets the number of arrangements before the schedule goes back to the first one
+    """
+    @abstractmethod
+    def get_num_arrangements(self):
+        pass
+
+    def on_advance(self, index: int):
+        pass
+
+    def on_restart(self):
+        pass
+
+
+class PermutationSchedule(SeatSchedule):
+    """
+    Goes through every permutation of the seats, in the order of Heap's algorithm
+    Adapted from https://www.geeksforgeeks.org/heaps-algorithm-for-generating-permutations/
+    Example for 3 players [x,y,z]: x,y,z / y,x,z / z,x,y / x,z,y / y,z,x / z,y,x / x,y,z (back to the first one)
+    The permutations are generated lazily, so only the current one is kept (there are n! of them)
+    """
+
+    def __init__(self, players: list):
+        super().__init__(players)
+        self.__permutations = None
+        self.__current = None
+        self.on_restart()
+
+    def __heap_permutation(self, a: list, size: int):
+        if size == 1:
+            yield a.copy()
+
+        for i in range(0, size):
+            yield from self.__heap_permutation(a, size - 1)
+
+            if size % 2 == 1:
+                a[0], a[size - 1] = a[size - 1], a[0]
+            else:
+                a[i], a[size - 1] = a[size - 1], a[i]
+
+    def get_positions(self):
+        return self.__current
+
+    def get_num_arrangements(self):
+        return math.factorial(len(self.get_players()))
+
+    def on_advance(self, index: int):
+        self.__current = next(self.__permutations)
+
+    def on_restart(self):
+        self.__permutations = self.__heap_permutation(list(self.get_players()), len(self.get_players()))
+        self.__current = next(self.__permutations)
+
+
+class RotationSchedule(SeatSchedule):
+    """
+    Rotates the players one seat at a time, so each player sits in each seat once in n games
+    Example for 3 players [x,y,z]: x,y,z / y,z,x / z,x,y / x,y,z (back to the first one)
+    """
+
+    def __init__(self, players: list):
+        super().__init__(players)
+        self.__current = list(players)
+
+    def get_positions(self):
+        return self.__current
+
+    def get_num_arrangements(self):
+        return len(self.get_players())
+
+    def on_advance(self, index: int):
+        players = self.get_players()
+        self.__current = players[index:] + players[:index]
+
+    def on_restart(self):
+        self.__current = list(self.get_players())
+
+
+class BalancedSchedule(SeatSchedule):
+    """
+    A balanced Latin square (Williams design): each player sits in each seat equally often, and each player sits right
+    before each other player equally often, so the advantage of acting before someone is also balanced
+    It takes n games for an even number of players, and 2n for an odd number (the rows are also played reversed)
+    Example for 4 players [a,b,c,d]: a,b,d,c / b,c,a,d / c,d,b,a / d,a,c,b / a,b,d,c (back to the first one)
+    """
+
+    def __init__(self, players: list):
+        super().__init__(players)
+        num_players = len(players)
+
+        # the first row alternates between the start and the end: 0, 1, n-1, 2, n-2, ...
+        self.__first_row = [0]
+        low, high = 1, num_players - 1
+        while len(self.__first_row) < num_players:
+            self.__first_row.append(low)
+            low += 1
+            if len(self.__first_row) < num_players:
+                self.__first_row.append(high)
+                high -= 1
+
+        self.__current = self.__get_row(0)
+
+    def __get_row(self, index: int):
+        players = self.get_players()
+        num_players = len(players)
+        row = [players[(seat + index) % num_players] for seat in self.__first_row]
+        # the odd designs play the rows again in reverse order
+        return row if index < num_players else row[::-1]
+
+    def get_positions(self):
+        return self.__current
+
+    def get_num_arrangements(self):
+        num_players = len(self.get_players())
+        return num_players if num_players % 2 == 0 else 2 * num_players
+
+    def on_advance(self, index: int):
+        self.__current = self.__get_row(index)
+
+    def on_restart(self):
+        self.__current = self.__get_row(0)
+
+
+"""
+The seat schedules that can be used by the simulators (see GameSimulator.set_seat_schedule)
+"""
+SEAT_SCHEDULES = {
+    'permutations': PermutationSchedule,
+    'rotations': RotationSchedule,
+    'balanced': BalancedSchedule,
+}
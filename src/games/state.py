@@ -3,6 +3,12 @@ from abc import ABC, abstractmethod
 
 class State(ABC):
 
+    """
+    The methods that change the state, which can't be called on a read-only StateView
+    States with other methods that change them must extend this list
+    """
+    MUTATING_METHODS = ('update', 'play', 'before_results')
+
     """
     Retrieve the number of players
     """
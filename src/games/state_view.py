@@ -0,0 +1,43 @@
+class StateView:
+    """
+    A read-only view of a game state, handed to the player callbacks instead of a clone of the state
+    Reading the view goes straight to the state, so no copy is made. The simulator detaches the views that players
+    kept before it changes the state (see detach), so a view never sees the moves played after the callback
+    The view can't be changed: players that need to simulate moves must ask for a mutable copy with clone()
+    The values returned by the view (e.g. the grid) belong to the state and must not be changed either
+    """
+
+    def __init__(self, state):
+        self.__state = state
+
+    def __getattr__(self, name):
+        if name in self.__state.MUTATING_METHODS:
+            raise AttributeError(f"'{name}' can't be called on a read-only state view, use clone() to get a mutable copy")
+        value = getattr(self.__state, name)
+        if callable(value):
+            # the bound method is kept in the view, so the next calls don't go through __getattr__
+            self.__dict__[name] = value
+        return value
+
+    # a pickled view is a copy of the state (e.g. to send it to another process)
+    def __reduce_ex__(self, protocol):
+        return unpickle_state, (self.__state,)
+
+    """
+    Gets a mutable copy of the state
+    """
+    def clone(self):
+        return self.__state.clone()
+
+    """
+    Makes the view keep a private copy of the state as it is now, so the next changes to the state don't show in it
+    """
+    def detach(self):
+        state = self.__state.clone()
+        # the kept methods are bound to the old state
+        self.__dict__.clear()
+        self.__state = state
+
+
+def unpickle_state(state):
+    return state
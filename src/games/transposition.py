@@ -0,0 +1,95 @@
+class TranspositionTable:
+    """
+    A bounded table of search results by position hash (e.g. Connect4State.get_hash), so a search doesn't search
+    again the positions reached through other move orders, or already searched for a previous move
+    Each hash goes to a single slot. When two positions want the same slot, the one searched deeper is kept
+    """
+
+    """
+    The kinds of values: the exact value of the position, or a lower or upper bound (after an alpha-beta cutoff)
+    """
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+
+    """
+    :param size: the number of slots, rounded up to a power of 2
+    """
+    def __init__(self, size: int = 2 ** 16):
+        self.__mask = (1 << max(size - 1, 1).bit_length()) - 1
+        # each slot is None or a tuple (hash, depth, value, kind, best action)
+        self.__slots = [None] * (self.__mask + 1)
+
+        # the number of lookups, the ones that found the position, and the ones that found another position in its slot
+        self.__probes = 0
+        self.__hits = 0
+        self.__collisions = 0
+
+    """
+    Looks up a position
+    :return: a tuple (hash, depth, value, kind, best action), or None if the position is not in the table
+    """
+    def probe(self, key: int):
+        self.__probes += 1
+        entry = self.__slots[key & self.__mask]
+        if entry is None:
+            return None
+        if entry[0] != key:
+            self.__collisions += 1
+            return None
+        self.__hits += 1
+        return entry
+
+    """
+    Stores the result of a search, unless its slot has another position searched deeper
+    :param depth: the depth of the search below the position
+    :param kind: EXACT, LOWER or UPPER
+    :param best_action: the best action found in the position (None if unknown), preferably as numbers (e.g. a column),
+    since the entries that only hold numbers are not tracked by the garbage collector
+    """
+    def store(self, key: int, depth: int, value, kind: int, best_action=None):
+        index = key & self.__mask
+        entry = self.__slots[index]
+        if entry is None or entry[0] == key or depth >= entry[1]:
+            self.__slots[index] = (key, depth, value, kind, best_action)
+
+    def clear(self):
+        self.__slots = [None] * (self.__mask + 1)
+
+    def get_size(self):
+        return self.__mask + 1
+
+    def get_probes(self):
+        return self.__probes
+
+    def get_hits(self):
+        return self.__hits
+
+    def get_collisions(self):
+        return self.__collisions
+
+    def get_hit_rate(self):
+        return 0.0 if self.__probes == 0 else self.__hits / self.__probes
+
+    def get_collision_rate(self):
+        return 0.0 if self.__probes == 0 else self.__collisions / self.__probes
+
+    """
+    Gets the number of lookups, hits and collisions, so the ones of many tables can be added up (see print_counters)
+    """
+    def get_counters(self):
+        return {'probes': self.__probes, 'hits': self.__hits, 'collisions': self.__collisions}
+
+    def print_stats(self, name: str):
+        TranspositionTable.print_counters(name, self.get_counters())
+
+    """
+    Prints the hit and collision rates of the counters of one or more tables (see get_counters)
+    """
+    @staticmethod
+    def print_counters(name: str, counters: dict):
+        probes = counters.get('probes', 0)
+        hit_rate = 0.0 if probes == 0 else counters.get('hits', 0) / probes
+        collision_rate = 0.0 if probes == 0 else counters.get('collisions', 0) / probes
+        print(f"Player {name} | Transposition table: {probes} probes | "
+              f"Hit rate: {hit_rate:.1%} | Collision rate: {collision_rate:.1%}")
@@ -1,68 +1,617 @@
 import argparse
+import asyncio
 import itertools
+import os
+import random
+import uuid
 from collections import namedtuple, defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 
+from checkpoint import Checkpoint
 from constants import AVAILABLE_GAME_TYPES, AVAILABLE_PLAYER_TYPES
+from games.game_log import GameLogWriter
+from games.game_simulator import INVALID_ACTION_POLICIES
+from games.instrumentation import Instrumentation
+from games.rng import derive_seed
+from games.sandbox import SandboxedPlayer
+from scheduler import EliminationScheduler
+from sprt import SequentialTest
+from stats import ScoreStats
+
+"""
+The compact outcome of a pairing: the total score of each player (by name), the number of games played, the
+ScoreStats of the average score per game of the first player in each iteration, when the pairing used a
+sequential test, the confidence of the test when it stopped, the number of games forfeited by each player by reason
+(e.g. {'a': {'timeout': 2}}), the invalid actions returned by each player (e.g. {'a': {'attempts': 3, 'seconds': 0.01}})
+and the counters of the players (see Player.get_counters, e.g. {'a': {'probes': 5000, 'hits': 1200}}), and with
+--game-log, the size of each game log file with the games of the result (e.g. {'logs/x.gamelog': 1024})
+"""
+PairingResult = namedtuple('PairingResult',
+                           ['scores', 'num_games', 'stats', 'confidence', 'forfeits', 'invalid_actions',
+                            'player_counters', 'game_logs'],
+                           defaults=[None, None, None, None, None])
 
 def run_simulation(game_settings):
-    removed_players = []
+    tournament = {
+        'removed_players': [],
+        # results of the pairings already played, kept across elimination rounds
+        'pairing_results': {},
+        # results of the pairings that were interrupted by a checkpoint, so they can be resumed
+        'partial_results': {},
+        # every shard seeds its own random stream from this value
+        'entropy': random.getrandbits(64) if game_settings['seed'] is None else game_settings['seed'],
+        # indicates if the pairings of the current round started (so a resumed round isn't started again)
+        'round_started': False,
+        # the game log files of the tournament start with this id, and keep the games of the results saved so far,
+        # up to these sizes (see save_checkpoint)
+        'game_log_id': uuid.uuid4().hex,
+        'game_logs': {}
+    }
 
-    while len(game_settings['players']) > 1:
-        scores = defaultdict(int)
-        match_results = defaultdict(dict)
+    if game_settings['resume']:
+        restore_checkpoint(game_settings, tournament)
+    game_settings['game_log_id'] = tournament['game_log_id']
 
-        for player1, player2 in itertools.combinations(game_settings['players'], 2):
-            simulator = game_settings['game']([player1, player2])
-            print(f"Simulation: {player1.get_name()} VS {player2.get_name()}")
+    removed_players = tournament['removed_players']
+    pairing_results = tournament['pairing_results']
+
+    # with more than one worker, the shards of each pairing are dispatched to a process pool
+    pool = None
+    if game_settings['workers'] > 1:
+        pool = ProcessPoolExecutor(max_workers=game_settings['workers'])
+
+    try:
+        while len(game_settings['players']) > 1:
+            scores = defaultdict(int)
+            match_results = defaultdict(dict)
 
-            names = {player1.get_name(): player1, player2.get_name(): player2}
+            if game_settings['replay_rounds'] and not tournament['round_started']:
+                pairing_results.clear()
+            tournament['round_started'] = True
+            # each round removes a player, so the number of removed players is the index of the round
+            game_settings['round'] = len(removed_players)
 
-            # Run initial iterations with progress bar
-            for _ in tqdm(range(game_settings['num_iterations']), desc="Running iterations"):
-                run_game_iteration(simulator, game_settings['seat_permutation'])
+            pairings = list(itertools.combinations(game_settings['players'], 2))
 
-            # Run additional iterations if there's a draw
-            while check_draw(simulator):
-                run_game_iteration(simulator, game_settings['seat_permutation'])
+            if game_settings['adaptive']:
+                run_adaptive_round(pool, game_settings, pairings, tournament)
+            else:
+                run_round(pool, game_settings, pairings, tournament)
 
-            update_scores(scores, simulator, names)
+            for player1, player2 in pairings:
+                result = pairing_results[(player1, player2)]
 
-            # Update match results for cross table
-            update_match_results(match_results, simulator, player1, player2)
+                names = {player1.get_name(): player1, player2.get_name(): player2}
+                # with adaptive scheduling the pairings have different numbers of games, so the averages are used
+                update_scores(scores, result, names, per_game=game_settings['adaptive'])
 
-            simulator.print_stats()
+                # Update match results for cross table
+                update_match_results(match_results, result, player1, player2, show_games=game_settings['adaptive'])
 
-        # Print cross table and leaderboard before removing a player
-        print_cross_table(match_results)
-        print_leaderboard(scores)
+            # Print cross table and leaderboard before removing a player
+            print_cross_table(match_results)
+            print_leaderboard(scores)
 
-        removed_player = remove_worst_player(game_settings['players'], scores)
-        removed_players.insert(0, removed_player)
+            removed_player = remove_worst_player(game_settings['players'], scores)
+            removed_players.insert(0, removed_player)
+
+            # only the pairings of the removed player are dropped, the others are reused in the next round
+            forget_player(pairing_results, removed_player)
+            tournament['round_started'] = False
+            save_checkpoint(game_settings, tournament)
+    finally:
+        if pool is not None:
+            pool.shutdown()
 
     last_remaining_player = game_settings['players'][0]
     removed_players.insert(0, last_remaining_player)
     print_leaderboard(removed_players, final=True)
 
+    instrumentation = game_settings['instrumentation']
+    if instrumentation is not None:
+        instrumentation.print_stats()
+        if game_settings['instrumentation_output'] is not None:
+            instrumentation.save(game_settings['instrumentation_output'])
+
+def run_round(pool, game_settings, pairings, tournament):
+    pairing_results = tournament['pairing_results']
+    partial_results = tournament['partial_results']
+
+    # only the pairings without a result are played
+    pending_pairings = [pairing for pairing in pairings if pairing not in pairing_results]
+
+    futures = {}
+    if pool is not None:
+        for player1, player2 in pending_pairings:
+            futures[(player1, player2)] = submit_pairing_shards(pool, game_settings, player1, player2,
+                                                                tournament['entropy'],
+                                                                partial_results.get((player1, player2)))
+
+    for player1, player2 in pending_pairings:
+        print(f"Simulation: {player1.get_name()} VS {player2.get_name()}")
+        partial = partial_results.get((player1, player2))
+
+        if pool is not None:
+            result = collect_pairing_shards(pool, game_settings, player1, player2, tournament['entropy'],
+                                            futures[(player1, player2)], partial)
+        else:
+            def on_checkpoint(partial_result, pairing=(player1, player2)):
+                partial_results[pairing] = partial_result
+                save_checkpoint(game_settings, tournament)
+
+            if game_settings['async_lanes'] > 0:
+                result = run_async_pairing(game_settings, player1, player2, show_progress=True, partial=partial)
+            else:
+                played = 0 if partial is None else partial.stats.get_count()
+                simulator = create_simulator(game_settings, [player1, player2], played)
+                try:
+                    result = run_pairing(simulator, game_settings, show_progress=True, partial=partial,
+                                         on_checkpoint=on_checkpoint)
+                finally:
+                    close_simulator(simulator)
+
+        pairing_results[(player1, player2)] = result
+        partial_results.pop((player1, player2), None)
+        save_checkpoint(game_settings, tournament)
+
+        print_pairing_stats(result, [player1, player2])
+
+def run_adaptive_round(pool, game_settings, pairings, tournament):
+    pairing_results = tournament['pairing_results']
+    scheduler = EliminationScheduler(game_settings['adaptive_batch'], game_settings['num_iterations'],
+                                     game_settings['adaptive_error_rate'])
+    played_pairings = set()
+
+    # keep adding batches of iterations until the scheduler knows which player is the worst
+    batch = scheduler.get_next_batch(pairings, pairing_results)
+    while batch:
+        if pool is not None:
+            futures = [submit_batch(pool, game_settings, pairing, num_iterations, pairing_results,
+                                    tournament['entropy'])
+                       for pairing, num_iterations in batch]
+            results = [future.result() for future in futures]
+        else:
+            results = [run_batch(game_settings, pairing, num_iterations, get_played_iterations(pairing_results, pairing))
+                       for pairing, num_iterations in batch]
+
+        for (pairing, _), result in zip(batch, results):
+            if pairing in pairing_results:
+                result = merge_pairing_results([pairing_results[pairing], result])
+            pairing_results[pairing] = result
+            played_pairings.add(pairing)
+
+        # the batches added so far are kept in the pairing results, so the round can be resumed from them
+        save_checkpoint(game_settings, tournament)
+
+        batch = scheduler.get_next_batch(pairings, pairing_results)
+
+    for player1, player2 in pairings:
+        if (player1, player2) in played_pairings:
+            print(f"Simulation: {player1.get_name()} VS {player2.get_name()}")
+            print_pairing_stats(pairing_results[(player1, player2)], [player1, player2])
+
+def save_checkpoint(game_settings, tournament):
+    checkpoint = game_settings['checkpoint']
+    if checkpoint is None:
+        return
+
+    # the players are saved by name, and rebuilt from the command line arguments when resuming
+    def by_name(results):
+        return {(player1.get_name(), player2.get_name()): result for (player1, player2), result in results.items()}
+
+    # the logs keep the sizes they had when their results were saved, even after the results are dropped (e.g. the
+    # pairings of a removed player), so only the games logged after the checkpoint are cut off when resuming
+    for result in itertools.chain(tournament['pairing_results'].values(), tournament['partial_results'].values()):
+        tournament['game_logs'].update(result.game_logs or {})
+
+    checkpoint.save({
+        'players': [player.get_name() for player in game_settings['players']],
+        'removed_players': [player.get_name() for player in tournament['removed_players']],
+        'pairing_results': by_name(tournament['pairing_results']),
+        'partial_results': by_name(tournament['partial_results']),
+        'entropy': tournament['entropy'],
+        'round_started': tournament['round_started'],
+        'game_log_id': tournament['game_log_id'],
+        'game_logs': tournament['game_logs'],
+        'random_state': random.getstate()
+    })
+
+def restore_checkpoint(game_settings, tournament):
+    progress = game_settings['checkpoint'].load()
+
+    players = {player.get_name(): player for player in game_settings['players']}
+    if set(players) != set(progress['players']) | set(progress['removed_players']):
+        raise ValueError("The players of the checkpoint don't match the players of the tournament")
+
+    def by_player(results):
+        return {(players[name1], players[name2]): result for (name1, name2), result in results.items()}
+
+    game_settings['players'] = [players[name] for name in progress['players']]
+    tournament['removed_players'] = [players[name] for name in progress['removed_players']]
+    tournament['pairing_results'] = by_player(progress['pairing_results'])
+    tournament['partial_results'] = by_player(progress['partial_results'])
+    tournament['entropy'] = progress['entropy']
+    tournament['round_started'] = progress['round_started']
+    tournament['game_log_id'] = progress['game_log_id']
+    tournament['game_logs'] = progress['game_logs']
+    random.setstate(progress['random_state'])
+
+    if game_settings['game_log'] is not None:
+        truncate_game_logs(game_settings['game_log'], tournament['game_log_id'], tournament['game_logs'])
+
+"""
+Cuts off the games that were logged after the checkpoint, which are played again when resuming
+:param game_logs: the size of each log file when the checkpoint was saved, the other files of the tournament are removed
+"""
+def truncate_game_logs(directory, game_log_id, game_logs):
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if not (name.startswith(game_log_id) and name.endswith(".gamelog")):
+            continue
+        if path in game_logs:
+            os.truncate(path, game_logs[path])
+        else:
+            os.remove(path)
+
+def run_batch(game_settings, pairing, num_iterations, played=0):
+    simulator = create_simulator(game_settings, list(pairing), played)
+    stats = ScoreStats()
+    try:
+        run_iterations(simulator, game_settings, num_iterations, stats)
+    finally:
+        close_simulator(simulator)
+    return get_pairing_result(simulator, stats)
+
+def submit_batch(pool, game_settings, pairing, num_iterations, pairing_results, entropy):
+    player1, player2 = pairing
+    # the number of iterations already played tells the batches of a pairing apart
+    played = get_played_iterations(pairing_results, pairing)
+    seed = derive_seed(entropy, player1.get_name(), player2.get_name(), 'batch', played)
+    player_specs = [get_player_spec(player1), get_player_spec(player2)]
+    return pool.submit(run_shard_in_worker, get_worker_settings(game_settings), player_specs, num_iterations, seed,
+                       played)
+
+def get_played_iterations(pairing_results, pairing):
+    return pairing_results[pairing].stats.get_count() if pairing in pairing_results else 0
+
+def run_pairing(simulator, game_settings, show_progress=False, partial=None, on_checkpoint=None):
+    # a resumed pairing continues from the iterations played before the checkpoint
+    stats = ScoreStats() if partial is None else ScoreStats().merge(partial.stats)
+    num_iterations = max(game_settings['num_iterations'] - stats.get_count(), 0)
+
+    def on_iteration():
+        # the partial result is only built when a checkpoint is due
+        checkpoint = game_settings['checkpoint']
+        if on_checkpoint is not None and checkpoint is not None and checkpoint.is_due():
+            on_checkpoint(get_pairing_result(simulator, stats, partial=partial))
+
+    sequential_test = run_iterations(simulator, game_settings, num_iterations, stats, show_progress, on_iteration)
+
+    # Run additional iterations if there's a draw
+    while check_draw(simulator, partial):
+        run_tracked_iteration(simulator, game_settings, stats)
+
+    return get_pairing_result(simulator, stats, sequential_test, partial)
+
+def run_iterations(simulator, game_settings, num_iterations, stats, show_progress=False, on_iteration=None):
+    iterations = range(num_iterations)
+    if show_progress:
+        # Run initial iterations with progress bar
+        iterations = tqdm(iterations, desc="Running iterations")
+
+    # with a sequential test, the iterations stop as soon as the test separates both players
+    sequential_test = None
+    if game_settings['sprt']:
+        sequential_test = SequentialTest(game_settings['sprt_delta'], game_settings['sprt_error_rate'])
+
+    for iteration in iterations:
+        run_tracked_iteration(simulator, game_settings, stats)
+
+        if on_iteration is not None:
+            on_iteration()
+
+        if sequential_test is not None:
+            if stats.get_count() >= game_settings['sprt_min_iterations'] and sequential_test.get_decision(stats) is not None:
+                break
+
+    return sequential_test
+
+def run_tracked_iteration(simulator, game_settings, stats):
+    start = get_first_player_totals(simulator)
+    run_game_iteration(simulator, game_settings['seat_permutation'])
+    add_iteration_observation(simulator, stats, start)
+
+async def run_tracked_iteration_async(simulator, game_settings, stats):
+    start = get_first_player_totals(simulator)
+    await run_game_iteration_async(simulator, game_settings['seat_permutation'])
+    add_iteration_observation(simulator, stats, start)
+
+def get_first_player_totals(simulator):
+    first_player = simulator.get_players()[0].get_name()
+    return simulator.get_global_score()[first_player], simulator.get_num_games()
+
+def add_iteration_observation(simulator, stats, start):
+    score, num_games = start
+    score_now, num_games_now = get_first_player_totals(simulator)
+
+    # the observation is the average score per game of the first player over the whole iteration
+    stats.add((score_now - score) / (num_games_now - num_games))
+
+def run_async_pairing(game_settings, player1, player2, show_progress=False, partial=None):
+    # each lane plays its games with its own simulator and player instances, so games of different lanes can be in
+    # flight at the same time while their players wait for replies
+    player_specs = [get_player_spec(player1), get_player_spec(player2)]
+    simulators = [create_simulator(game_settings, [player_class(name) for player_class, name in player_specs])
+                  for _lane in range(game_settings['async_lanes'])]
+    stats = [ScoreStats() for _ in simulators]
+
+    # a resumed pairing only plays the iterations that are missing
+    played = 0 if partial is None else partial.stats.get_count()
+    num_iterations = max(game_settings['num_iterations'] - played, 0)
+
+    def merge_lanes():
+        results = [get_pairing_result(simulator, lane_stats) for simulator, lane_stats in zip(simulators, stats)]
+        if partial is not None:
+            results.insert(0, partial)
+        return merge_pairing_results(results)
+
+    try:
+        progress = tqdm(total=num_iterations, desc="Running iterations") if show_progress else None
+        asyncio.run(run_lanes(simulators, game_settings, played, num_iterations, stats, progress))
+        if progress is not None:
+            progress.close()
+
+        # Run additional iterations if there's a draw, after the ones of the lanes
+        result = merge_lanes()
+        iteration = max(game_settings['num_iterations'], played)
+        while is_draw(result.scores):
+            move_to_iteration(simulators[0], game_settings, iteration)
+            asyncio.run(run_tracked_iteration_async(simulators[0], game_settings, stats[0]))
+            result = merge_lanes()
+            iteration += 1
+    finally:
+        for simulator in simulators:
+            close_simulator(simulator)
+
+    return result
+
+async def run_lanes(simulators, game_settings, first_iteration, num_iterations, stats, progress=None):
+    next_iteration = first_iteration
+    end = first_iteration + num_iterations
+
+    async def run_lane(simulator, lane_stats):
+        nonlocal next_iteration
+        # the lanes take the next iteration as soon as they finish one, and play it like a single simulator would
+        while next_iteration < end:
+            iteration = next_iteration
+            next_iteration += 1
+            move_to_iteration(simulator, game_settings, iteration)
+            await run_tracked_iteration_async(simulator, game_settings, lane_stats)
+            if progress is not None:
+                progress.update()
+
+    await asyncio.gather(*(run_lane(simulator, lane_stats) for simulator, lane_stats in zip(simulators, stats)))
+
+def get_pairing_result(simulator, stats, sequential_test=None, partial=None):
+    confidence = None if sequential_test is None else sequential_test.get_confidence(stats)
+    forfeits = merge_counters([simulator.get_forfeits(), None if partial is None else partial.forfeits])
+    invalid_actions = merge_counters([simulator.get_invalid_actions(),
+                                      None if partial is None else partial.invalid_actions])
+    player_counters = merge_counters([simulator.get_player_counters(),
+                                      None if partial is None else partial.player_counters])
+    game_logs = dict(partial.game_logs or {}) if partial is not None else {}
+    if simulator.get_game_log() is not None:
+        game_log = simulator.get_game_log()
+        game_logs[game_log.get_path()] = game_log.get_offset()
+    return PairingResult(get_scores(simulator, partial), simulator.get_num_games() + get_num_games(partial),
+                         stats, confidence, forfeits, invalid_actions, player_counters, game_logs)
+
+def merge_counters(counters):
+    # adds up counters by player name and key (e.g. the forfeits of each player by reason)
+    merged = defaultdict(lambda: defaultdict(int))
+    for result_counters in counters:
+        for player_name, values in (result_counters or {}).items():
+            for key, value in values.items():
+                merged[player_name][key] += value
+    return {player_name: dict(values) for player_name, values in merged.items()}
+
+def get_scores(simulator, partial=None):
+    # the scores of the simulator, plus the ones of the games played before resuming from a checkpoint
+    scores = simulator.get_global_score()
+    if partial is not None:
+        scores = {name: score + partial.scores[name] for name, score in scores.items()}
+    return scores
+
+def get_num_games(result):
+    return 0 if result is None else result.num_games
+
+def run_shard_in_worker(worker_settings, player_specs, num_iterations, seed, first_iteration=0):
+    # each shard has its own random stream, whatever worker process ends up running it
+    random.seed(seed)
+
+    # player instances can't be shared between processes, so each worker builds its own
+    players = [player_class(name) for player_class, name in player_specs]
+    simulator = create_simulator(worker_settings, players, first_iteration)
+
+    # a shard is made of whole iterations, so both games of a seat permutation are played in the same shard
+    stats = ScoreStats()
+    try:
+        sequential_test = run_iterations(simulator, worker_settings, num_iterations, stats)
+    finally:
+        close_simulator(simulator)
+
+    return get_pairing_result(simulator, stats, sequential_test)
+
+def submit_pairing_shards(pool, game_settings, player1, player2, entropy, partial=None):
+    worker_settings = get_worker_settings(game_settings)
+    player_specs = [get_player_spec(player1), get_player_spec(player2)]
+
+    # a resumed pairing only plays the iterations that are missing, and the number of iterations played before the
+    # checkpoint tells their random streams apart
+    played = 0 if partial is None else partial.stats.get_count()
+    num_iterations = max(game_settings['num_iterations'] - played, 0)
+
+    futures = []
+    first_iteration = played
+    for shard, shard_iterations in enumerate(split_iterations(num_iterations, game_settings['shards'])):
+        seed = derive_seed(entropy, player1.get_name(), player2.get_name(), *get_round_keys(game_settings), played,
+                           shard)
+        futures.append(pool.submit(run_shard_in_worker, worker_settings, player_specs, shard_iterations, seed,
+                                   first_iteration))
+        first_iteration += shard_iterations
+    return futures
+
+def collect_pairing_shards(pool, game_settings, player1, player2, entropy, futures, partial=None):
+    results = [future.result() for future in futures]
+    if partial is not None:
+        results.insert(0, partial)
+    result = merge_pairing_results(results)
+
+    # Run additional iterations if there's a draw, one extra shard at a time
+    worker_settings = get_worker_settings(game_settings)
+    player_specs = [get_player_spec(player1), get_player_spec(player2)]
+    played = 0 if partial is None else partial.stats.get_count()
+    shard = len(futures)
+    # the extra iterations come after the ones of the shards, like in a pairing played in a single process
+    first_iteration = max(game_settings['num_iterations'], played)
+    while is_draw(result.scores):
+        seed = derive_seed(entropy, player1.get_name(), player2.get_name(), *get_round_keys(game_settings), played,
+                           shard)
+        extra = pool.submit(run_shard_in_worker, worker_settings, player_specs, 1, seed, first_iteration).result()
+        result = merge_pairing_results([result, extra])
+        shard += 1
+        first_iteration += 1
+
+    return result
+
+def split_iterations(num_iterations, num_shards):
+    # spreads the iterations as evenly as possible, without creating empty shards
+    base, remainder = divmod(num_iterations, num_shards)
+    shards = [base + 1 if shard < remainder else base for shard in range(num_shards)]
+    return [shard for shard in shards if shard > 0]
+
+def merge_pairing_results(results):
+    scores = defaultdict(int)
+    for result in results:
+        for player_name, score in result.scores.items():
+            scores[player_name] += score
+
+    # sequential tests only run in pairings with a single shard, so there is at most one confidence
+    confidences = [result.confidence for result in results if result.confidence is not None]
+    confidence = confidences[0] if confidences else None
+
+    stats = ScoreStats()
+    for result in results:
+        stats = stats.merge(result.stats)
+
+    forfeits = merge_counters([result.forfeits for result in results])
+    invalid_actions = merge_counters([result.invalid_actions for result in results])
+    player_counters = merge_counters([result.player_counters for result in results])
+    game_logs = {}
+    for result in results:
+        game_logs.update(result.game_logs or {})
+    return PairingResult(dict(scores), sum(result.num_games for result in results), stats, confidence, forfeits,
+                         invalid_actions, player_counters, game_logs)
+
+"""
+Builds the simulator of a pairing (or of a part of it)
+:param first_iteration: the index of the first iteration it plays in the pairing, so with a seed its games get the same
+random streams wherever they are played (see GameSimulator.set_seed)
+"""
+def create_simulator(game_settings, players, first_iteration=0):
+    # sandboxed players run in their own worker processes, which are stopped by close_simulator
+    if game_settings['sandbox']:
+        players = [SandboxedPlayer(player.__class__, player.get_name(), game_settings['sandbox_timeout'],
+                                   game_settings['sandbox_cpu'], game_settings['sandbox_memory'])
+                   for player in players]
+
+    simulator = game_settings['game'](players)
+    simulator.set_history(game_settings['history'], game_settings['spill_after'])
+    simulator.set_invalid_action_policy(game_settings['max_retries'], game_settings['invalid_action_policy'])
+    simulator.set_time_control(game_settings['move_time'], game_settings['game_time'], game_settings['time_increment'])
+    # all the simulators share the instrumentation, which keeps the timings of each player by name
+    simulator.set_instrumentation(game_settings['instrumentation'])
+
+    # the games are played in the same seats and with the same random streams as in a single process
+    move_to_iteration(simulator, game_settings, first_iteration)
+
+    # each simulator writes its own game log file, so workers never share a file
+    if game_settings['game_log'] is not None:
+        path = os.path.join(game_settings['game_log'], f"{game_settings['game_log_id']}-{uuid.uuid4().hex}.gamelog")
+        simulator.set_game_log(GameLogWriter(path, game_settings['game_log_actions']))
+
+    return simulator
+
+def get_pairing_seed(game_settings, players):
+    return derive_seed(game_settings['seed'], *[player.get_name() for player in players], *get_round_keys(game_settings))
+
+def get_round_keys(game_settings):
+    # with replayed rounds, each round plays other games than the rounds before
+    return ['round', game_settings['round']] if game_settings['replay_rounds'] else []
+
+"""
+Moves a simulator to an iteration of its pairing, with the seats and the random streams that the iteration has in a
+simulator that plays the whole pairing (e.g. for the lanes of the asyncio driver, which take the iterations in turns)
+"""
+def move_to_iteration(simulator, game_settings, iteration):
+    # each iteration changes the seats once
+    if game_settings['seat_permutation']:
+        schedule = simulator.get_seat_schedule()
+        while schedule.get_index() != iteration % schedule.get_num_arrangements():
+            simulator.change_player_positions()
+
+    if game_settings['seed'] is not None:
+        simulator.set_seed(get_pairing_seed(game_settings, simulator.get_players()),
+                           iteration * get_games_per_iteration(game_settings))
+
+def get_games_per_iteration(game_settings):
+    # with seat permutations, an iteration plays a game, changes the seats and plays another one
+    return 2 if game_settings['seat_permutation'] else 1
+
+def close_simulator(simulator):
+    # writes the games still buffered by the game log
+    if simulator.get_game_log() is not None:
+        simulator.get_game_log().close()
+
+    for player in simulator.get_players():
+        if isinstance(player, SandboxedPlayer):
+            player.close()
+
+def get_player_spec(player):
+    # players are always built from their class and name, so this is all a worker needs to rebuild them
+    return player.__class__, player.get_name()
+
+def get_worker_settings(game_settings):
+    # the player instances and the checkpoints stay in the main process
+    return {key: value for key, value in game_settings.items() if key not in ('players', 'checkpoint')}
+
 def run_game_iteration(simulator, seat_permutation):
     simulator.run_simulation()
     if seat_permutation:
         simulator.change_player_positions()
         simulator.run_simulation()
 
-def check_draw(simulator):
-    global_scores = simulator.get_global_score()
+async def run_game_iteration_async(simulator, seat_permutation):
+    await simulator.run_simulation_async()
+    if seat_permutation:
+        simulator.change_player_positions()
+        await simulator.run_simulation_async()
+
+def check_draw(simulator, partial=None):
+    return is_draw(get_scores(simulator, partial))
+
+def is_draw(global_scores):
     # Assuming there are only two players in each game
     player_scores = list(global_scores.values())
     if len(player_scores) == 2 and player_scores[0] == player_scores[1]:
         return True  # It's a draw
     return False  # Not a draw
 
-def update_scores(scores, simulator, names):
+def update_scores(scores, result, names, per_game=False):
     # Update global scores for each player
-    global_scores = simulator.get_global_score()
-    for player_name, score in global_scores.items():
-        scores[names[player_name]] += score
+    for player_name, score in result.scores.items():
+        scores[names[player_name]] += score / result.num_games if per_game else score
 
 def remove_worst_player(players, scores):
     # Find the player with the lowest score
@@ -70,18 +619,54 @@ def remove_worst_player(players, scores):
     players.remove(lowest_score_player)
     return lowest_score_player
 
-def update_match_results(match_results, simulator, player1, player2):
-    result = simulator.get_global_score()  # Assuming this method exists and returns the match result
-    match_results[player1.get_name()][player2.get_name()] = result[player1.get_name()]
-    match_results[player2.get_name()][player1.get_name()] = result[player2.get_name()]
+def forget_player(pairing_results, player):
+    for pairing in [pairing for pairing in pairing_results if player in pairing]:
+        del pairing_results[pairing]
+
+def update_match_results(match_results, result, player1, player2, show_games=False):
+    match_results[player1.get_name()][player2.get_name()] = format_match_result(result, player1, show_games)
+    match_results[player2.get_name()][player1.get_name()] = format_match_result(result, player2, show_games)
+
+def format_match_result(result, player, show_games=False):
+    score = result.scores[player.get_name()]
+    if result.confidence is not None:
+        # pairings with a sequential test also show where the test stopped and its confidence
+        return f"{score} ({result.num_games}g, {result.confidence:.1%})"
+    if show_games:
+        return f"{score} ({result.num_games}g)"
+    return score
+
+def print_pairing_stats(result, players):
+    # same output as GameSimulator.print_stats, but it also works for pairings played in a worker
+    for player in players:
+        name = player.get_name()
+        print(f"Player {name} | Total score: {result.scores[name]}$ | Avg. score per game: {result.scores[name] / result.num_games}$")
+
+    # the players that lost games by forfeit (e.g. running out of time)
+    for name, reasons in (result.forfeits or {}).items():
+        print(f"Player {name} | Forfeits: " + ", ".join(f"{count} ({reason})" for reason, count in sorted(reasons.items())))
+
+    for name, invalid_actions in (result.invalid_actions or {}).items():
+        print(f"Player {name} | Invalid actions: {invalid_actions['attempts']} | Time spent on them: {invalid_actions['seconds']:.3f}s")
+
+    # the stats kept by the players themselves (e.g. the transposition tables of the minimax players), from the
+    # instances that played the games, wherever they were
+    for player in players:
+        counters = (result.player_counters or {}).get(player.get_name())
+        if counters:
+            type(player).print_counters(player.get_name(), counters)
 
 def print_cross_table(match_results):
     print("\nCross Table:")
     player_names = sorted(match_results.keys())
-    print(" " * 15 + " ".join(f"{name:<15}" for name in player_names))
+
+    # the columns are widened when a result doesn't fit
+    width = max([15] + [len(str(result)) + 1 for results in match_results.values() for result in results.values()])
+
+    print(" " * 15 + " ".join(f"{name:<{width}}" for name in player_names))
     for name in player_names:
         results = [match_results[name].get(opponent, 'N/A') for opponent in player_names]
-        print(f"{name:<15}" + " ".join(f"{result:<15}" for result in results))
+        print(f"{name:<15}" + " ".join(f"{result:<{width}}" for result in results))
     print()
 
 def print_leaderboard(players, final=False):
@@ -96,10 +681,27 @@ def print_leaderboard(players, final=False):
     else:
         sorted_scores = sorted(players.items(), key=lambda x: x[1], reverse=True)
         for position, (player, score) in enumerate(sorted_scores, start=1):
-            print("{:2}. {:<40} {:>5}".format(position, f"{player.get_name()} ({player.__class__.__name__})", score))
+            # the adaptive rounds rank the players by their mean score per game, which is not a whole number
+            score_format = "{:>8.3f}" if isinstance(score, float) else "{:>5}"
+            print(("{:2}. {:<40} " + score_format).format(position, f"{player.get_name()} ({player.__class__.__name__})",
+                                                         score))
 
     print("=" * 60 + "\n")
 
+def parse_history(value):
+    # 'full' keeps every game result, 'off' keeps none, and a number keeps only the last results
+    if value == 'full':
+        return None
+    if value == 'off':
+        return 0
+    try:
+        max_games = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid history '{value}', expected 'full', 'off' or a number")
+    if max_games < 0:
+        raise argparse.ArgumentTypeError("the history size must be 0 or over")
+    return max_games
+
 def main():
     # Define a namedtuple for a Player
     Player = namedtuple('Player', ['name', 'type'])
@@ -118,6 +720,111 @@ def main():
     parser.add_argument('--num-iterations', type=int, default=10000,
                         help='Number of iterations in the simulation. Defaults to 10000.')
 
+    # Number of worker processes (default: 1)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of processes used to run pairings in parallel. Defaults to 1 (no parallelism).')
+
+    # Number of shards per pairing (default: 1)
+    parser.add_argument('--shards', type=int, default=1,
+                        help='Number of shards the iterations of each pairing are split into, to run a single pairing on several workers. Defaults to 1.')
+
+    # Replay every pairing in each elimination round (default: False)
+    parser.add_argument('--replay-rounds', action='store_true', default=False,
+                        help='Replay every pairing in each elimination round instead of reusing the results of previous rounds. Defaults to False.')
+
+    # Per-game history kept by each simulator (default: full)
+    parser.add_argument('--history', type=parse_history, default='full',
+                        help="Game results kept in memory by each simulator: 'full', 'off' or the number of last games. Defaults to full.")
+
+    # Number of games after which the history is moved to memory-mapped files (default: never)
+    parser.add_argument('--spill-after', type=int, default=None,
+                        help='Number of games after which the history of a simulator is moved to memory-mapped temporary files. Defaults to never.')
+
+    # Sequential early stopping of the pairings (default: False)
+    parser.add_argument('--sprt', action='store_true', default=False,
+                        help='Stop each pairing as soon as a sequential probability ratio test separates both players. Defaults to False.')
+
+    parser.add_argument('--sprt-delta', type=float, default=0.1,
+                        help='Difference in score per game that the sequential test should detect. Defaults to 0.1.')
+
+    parser.add_argument('--sprt-error-rate', type=float, default=0.05,
+                        help='Probability of the sequential test picking the wrong player. Defaults to 0.05.')
+
+    parser.add_argument('--sprt-min-iterations', type=int, default=50,
+                        help='Minimum number of iterations before the sequential test can stop a pairing. Defaults to 50.')
+
+    # Adaptive scheduling of the games in each elimination round (default: False)
+    parser.add_argument('--adaptive', action='store_true', default=False,
+                        help='Only add games to the pairings that can change which player is removed in each round. Defaults to False.')
+
+    parser.add_argument('--adaptive-batch', type=int, default=10,
+                        help='Number of iterations added to a pairing at a time with adaptive scheduling. Defaults to 10.')
+
+    parser.add_argument('--adaptive-error-rate', type=float, default=0.05,
+                        help='Probability of the confidence interval of a player being wrong with adaptive scheduling. Defaults to 0.05.')
+
+    # Checkpoint file of the tournament (default: no checkpoints)
+    parser.add_argument('--checkpoint', default=None, metavar='PATH',
+                        help='File where the progress of the tournament is saved, so it can be resumed. Defaults to no checkpoints.')
+
+    parser.add_argument('--checkpoint-interval', type=float, default=60.0,
+                        help='Minimum number of seconds between the checkpoints saved in the middle of a pairing. Defaults to 60.')
+
+    parser.add_argument('--resume', action='store_true', default=False,
+                        help='Resume the tournament from the last checkpoint. Defaults to False.')
+
+    # Directory of the game logs (default: no game logs)
+    parser.add_argument('--game-log', default=None, metavar='DIR',
+                        help='Directory where a record of every game is written, to be analyzed with analyze_games.py. Defaults to no game logs.')
+
+    parser.add_argument('--game-log-actions', action='store_true', default=False,
+                        help='Also write the sequence of actions of every game to the game logs. Defaults to False.')
+
+    # Number of games of each pairing in flight at the same time, with the asyncio driver (default: 0, no asyncio)
+    parser.add_argument('--async-lanes', type=int, default=0,
+                        help='Number of games of each pairing played at the same time by the asyncio driver, for players with an async get_action. Defaults to 0 (no asyncio).')
+
+    # Sandbox of the players (default: False)
+    parser.add_argument('--sandbox', action='store_true', default=False,
+                        help='Run each player in its own worker process, which is restarted if the player crashes, hangs or exceeds its limits. Defaults to False.')
+
+    parser.add_argument('--sandbox-timeout', type=float, default=10.0,
+                        help='Seconds a sandboxed player can take to reply before its worker is restarted. Defaults to 10.')
+
+    parser.add_argument('--sandbox-cpu', type=int, default=None,
+                        help='CPU time limit in seconds of each sandbox worker process in each game. Defaults to no limit.')
+
+    parser.add_argument('--sandbox-memory', type=int, default=None,
+                        help='Memory limit in MB of each sandbox worker process. Defaults to no limit.')
+
+    # Time control (default: no limits)
+    parser.add_argument('--move-time', type=float, default=None,
+                        help='Seconds a player has to choose each action, or it forfeits the game. Defaults to no limit.')
+
+    parser.add_argument('--game-time', type=float, default=None,
+                        help='Seconds a player has for all its actions in a game, like a chess clock, or it forfeits the game. Defaults to no limit.')
+
+    parser.add_argument('--time-increment', type=float, default=0.0,
+                        help='Seconds added to the --game-time of a player after each action. Defaults to 0.')
+
+    # Invalid actions (default: a player is asked again 10 times, and then forfeits the game)
+    parser.add_argument('--max-retries', type=int, default=10,
+                        help='Number of times a player that returns an invalid action is asked again for that action, before --invalid-action-policy is applied. Defaults to 10.')
+
+    parser.add_argument('--invalid-action-policy', choices=INVALID_ACTION_POLICIES, default='forfeit',
+                        help='What happens when a player runs out of retries: it forfeits the game, or a random valid action is played for it. Defaults to forfeit.')
+
+    # Timings of the player callbacks and state operations (default: False)
+    parser.add_argument('--instrument', action='store_true', default=False,
+                        help='Measure the time spent in each player callback and state operation, and print it at the end. Defaults to False.')
+
+    parser.add_argument('--instrument-output', default=None, metavar='PATH',
+                        help='File where the timings of --instrument are written as JSON. Defaults to not writing them.')
+
+    # Seed of the tournament (default: a random seed)
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Seed of the tournament, so it can be reproduced. Each game gets its own random stream, derived from the seed, the pairing and the index of the game. Defaults to a random seed.')
+
     # Player argument. This should be specified at least twice.
     parser.add_argument('--player', action='append', nargs=2, metavar=('NAME', 'TYPE'),
                         help='Add a player with a name and type. Requires two values. This option should be specified at least twice.')
@@ -128,6 +835,63 @@ def main():
     if args.player is None or len(args.player) < 2:
         parser.error('At least two --player arguments are required.')
 
+    if args.workers < 1:
+        parser.error('--workers must be 1 or over.')
+
+    if args.shards < 1:
+        parser.error('--shards must be 1 or over.')
+
+    if args.sprt and args.shards > 1:
+        parser.error('--sprt needs the games of a pairing to be played in order, so it can\'t be used with --shards.')
+
+    if args.adaptive and (args.sprt or args.shards > 1):
+        parser.error('--adaptive schedules the games of each pairing, so it can\'t be used with --sprt or --shards.')
+
+    if args.adaptive_batch < 2:
+        parser.error('--adaptive-batch must be 2 or over.')
+
+    if not 0 < args.adaptive_error_rate < 1:
+        parser.error('--adaptive-error-rate must be between 0 and 1.')
+
+    if args.async_lanes < 0:
+        parser.error('--async-lanes can\'t be negative.')
+
+    if args.async_lanes > 0 and (args.workers > 1 or args.sprt or args.adaptive):
+        parser.error('--async-lanes can\'t be used with --workers, --sprt or --adaptive.')
+
+    if args.sandbox_timeout <= 0:
+        parser.error('--sandbox-timeout must be over 0.')
+
+    if (args.sandbox_cpu is not None and args.sandbox_cpu < 1) or (args.sandbox_memory is not None and args.sandbox_memory < 1):
+        parser.error('--sandbox-cpu and --sandbox-memory must be 1 or over.')
+
+    if (args.move_time is not None and args.move_time <= 0) or (args.game_time is not None and args.game_time <= 0):
+        parser.error('--move-time and --game-time must be over 0.')
+
+    if args.time_increment < 0:
+        parser.error('--time-increment can\'t be negative.')
+
+    if args.max_retries < 0:
+        parser.error('--max-retries can\'t be negative.')
+
+    if args.instrument_output is not None:
+        args.instrument = True
+
+    if args.instrument and args.workers > 1:
+        parser.error('--instrument measures the games played in the main process, so it can\'t be used with --workers.')
+
+    if args.resume and (args.checkpoint is None or not os.path.isfile(args.checkpoint)):
+        parser.error('--resume needs an existing --checkpoint file.')
+
+    if args.game_log is not None:
+        os.makedirs(args.game_log, exist_ok=True)
+
+    if args.sprt_delta <= 0:
+        parser.error('--sprt-delta must be over 0.')
+
+    if not 0 < args.sprt_error_rate < 0.5:
+        parser.error('--sprt-error-rate must be between 0 and 0.5.')
+
     try:
         # Retrieve available player types for the selected game
         available_player_types = AVAILABLE_PLAYER_TYPES[args.game]
@@ -161,6 +925,37 @@ def main():
         'game': AVAILABLE_GAME_TYPES[args.game],
         'seat_permutation': args.seat_permutation,
         'num_iterations': args.num_iterations,
+        'workers': args.workers,
+        'shards': args.shards,
+        'replay_rounds': args.replay_rounds,
+        # the index of the current elimination round
+        'round': 0,
+        'history': args.history,
+        'spill_after': args.spill_after,
+        'sprt': args.sprt,
+        'sprt_delta': args.sprt_delta,
+        'sprt_error_rate': args.sprt_error_rate,
+        'sprt_min_iterations': args.sprt_min_iterations,
+        'adaptive': args.adaptive,
+        'adaptive_batch': args.adaptive_batch,
+        'adaptive_error_rate': args.adaptive_error_rate,
+        'checkpoint': None if args.checkpoint is None else Checkpoint(args.checkpoint, args.checkpoint_interval),
+        'resume': args.resume,
+        'game_log': args.game_log,
+        'game_log_actions': args.game_log_actions,
+        'async_lanes': args.async_lanes,
+        'sandbox': args.sandbox,
+        'sandbox_timeout': args.sandbox_timeout,
+        'sandbox_cpu': args.sandbox_cpu,
+        'sandbox_memory': None if args.sandbox_memory is None else args.sandbox_memory * 2 ** 20,
+        'move_time': args.move_time,
+        'game_time': args.game_time,
+        'time_increment': args.time_increment,
+        'seed': args.seed,
+        'max_retries': args.max_retries,
+        'invalid_action_policy': args.invalid_action_policy,
+        'instrumentation': Instrumentation() if args.instrument else None,
+        'instrumentation_output': args.instrument_output,
         'players': players
     }
 
@@ -0,0 +1,87 @@
+import math
+from collections import defaultdict
+from statistics import NormalDist
+
+
+class EliminationScheduler:
+    """
+    Adaptive scheduling of the games of an elimination round
+    Only the worst player is removed in each round, so this is a best-arm identification problem (for the worst arm):
+    games are only added to the pairings of the players that can still be the worst one, and the round ends as soon as
+    a single candidate is left (or the pairings of the candidates reached their maximum number of iterations).
+    The strength of a player is its average score per game against each opponent, with a confidence interval built
+    from the ScoreStats of its pairings.
+    """
+
+    """
+    :param batch_size: number of iterations added to a pairing at a time
+    :param max_iterations: maximum number of iterations of a pairing
+    :param error_rate: probability of a confidence interval not containing the strength of a player
+    """
+    def __init__(self, batch_size: int, max_iterations: int, error_rate: float):
+        if batch_size < 2:
+            raise ValueError("the batch size must be 2 or over, to estimate the variance of each pairing")
+
+        self.__batch_size = batch_size
+        self.__max_iterations = max_iterations
+        self.__z = NormalDist().inv_cdf(1 - error_rate / 2)
+
+    """
+    Gets the estimated strength of each player and the half width of its confidence interval
+    :param pairings: the (player1, player2) pairings of the round
+    :param pairing_results: the results of the pairings played so far (each with scores, num_games and stats)
+    :return: a dict with a (mean, half_width) tuple for each player
+    """
+    def get_estimates(self, pairings, pairing_results):
+        means = defaultdict(list)
+        variances = defaultdict(list)
+
+        for pairing in pairings:
+            result = pairing_results.get(pairing)
+            for player in pairing:
+                if result is None or result.num_games == 0:
+                    means[player].append(0.0)
+                    variances[player].append(math.inf)
+                    continue
+
+                means[player].append(result.scores[player.get_name()] / result.num_games)
+                variance = result.stats.get_variance()
+                # the variance of the mean score is the same for both players of a zero-sum game
+                variances[player].append(math.inf if variance is None else variance / result.stats.get_count())
+
+        estimates = {}
+        for player in means:
+            num_opponents = len(means[player])
+            estimates[player] = (sum(means[player]) / num_opponents,
+                                 self.__z * math.sqrt(sum(variances[player])) / num_opponents)
+        return estimates
+
+    """
+    Gets the players whose confidence interval overlaps the one of the (apparently) worst player
+    """
+    def get_candidates(self, pairings, pairing_results):
+        estimates = self.get_estimates(pairings, pairing_results)
+        worst_upper_bound = min(mean + half_width for mean, half_width in estimates.values())
+        return [player for player, (mean, half_width) in estimates.items() if mean - half_width <= worst_upper_bound]
+
+    """
+    Gets the next iterations to play
+    :return: a list of (pairing, num_iterations), empty once the worst player is found
+    """
+    def get_next_batch(self, pairings, pairing_results):
+        candidates = self.get_candidates(pairings, pairing_results)
+        if len(candidates) <= 1:
+            return []
+
+        batch = []
+        for pairing in pairings:
+            # the pairings without candidates can't change which player is removed
+            if pairing[0] not in candidates and pairing[1] not in candidates:
+                continue
+
+            result = pairing_results.get(pairing)
+            played = 0 if result is None else result.stats.get_count()
+            num_iterations = min(self.__batch_size, self.__max_iterations - played)
+            if num_iterations > 0:
+                batch.append((pairing, num_iterations))
+        return batch
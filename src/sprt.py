@@ -0,0 +1,58 @@
+import math
+
+
+class SequentialTest:
+    """
+    Sequential probability ratio test (SPRT) between the two players of a pairing
+    It runs on the ScoreStats of the pairing, where each observation is the average score per game of the first player
+    in one iteration. The test compares the hypothesis that the first player wins `delta` per game against the
+    hypothesis that it loses `delta` per game, using a normal approximation with the variance of the observations.
+    """
+
+    """
+    :param delta: the difference in score per game that we want to detect
+    :param error_rate: the probability of picking the wrong player (used for both error types)
+    """
+    def __init__(self, delta: float, error_rate: float):
+        if delta <= 0:
+            raise ValueError("delta must be over 0")
+        if not 0 < error_rate < 0.5:
+            raise ValueError("the error rate must be between 0 and 0.5")
+
+        self.__delta = delta
+
+        """
+        the log-likelihood ratio bounds to accept each hypothesis
+        """
+        self.__upper_bound = math.log((1 - error_rate) / error_rate)
+        self.__lower_bound = -self.__upper_bound
+
+    """
+    The log-likelihood ratio of "the first player is better" against "the second player is better"
+    :param stats: the ScoreStats of the pairing
+    """
+    def get_llr(self, stats):
+        variance = stats.get_variance()
+        if variance is None:
+            return 0.0
+        # a tiny floor avoids dividing by 0 while every observation is the same
+        return 2 * self.__delta * stats.get_sum() / max(variance, 1e-9)
+
+    """
+    Gets the player that the test picked (0 or 1), or None while the players are not separated yet
+    :param stats: the ScoreStats of the pairing
+    """
+    def get_decision(self, stats):
+        llr = self.get_llr(stats)
+        if llr >= self.__upper_bound:
+            return 0
+        if llr <= self.__lower_bound:
+            return 1
+        return None
+
+    """
+    The probability of the most likely hypothesis, assuming both were equally likely before the games
+    :param stats: the ScoreStats of the pairing
+    """
+    def get_confidence(self, stats):
+        return 1 / (1 + math.exp(-abs(self.get_llr(stats))))
@@ -0,0 +1,44 @@
+class ScoreStats:
+    """
+    Running statistics of a series of observations (e.g. the average score per game of a player in each iteration)
+    They only keep the count, the sum and the sum of squares, so stats from different shards can be merged
+    """
+
+    def __init__(self, count: int = 0, total: float = 0.0, total_squares: float = 0.0):
+        self.__count = count
+        self.__total = total
+        self.__total_squares = total_squares
+
+    def add(self, value: float):
+        self.__count += 1
+        self.__total += value
+        self.__total_squares += value * value
+
+    """
+    Returns new stats with the observations of both
+    """
+    def merge(self, other):
+        return ScoreStats(self.__count + other.get_count(), self.__total + other.get_sum(),
+                          self.__total_squares + other.get_sum_squares())
+
+    def get_count(self):
+        return self.__count
+
+    def get_sum(self):
+        return self.__total
+
+    def get_sum_squares(self):
+        return self.__total_squares
+
+    def get_mean(self):
+        return self.__total / self.__count if self.__count > 0 else 0.0
+
+    """
+    The sample variance of the observations (None with less than 2 observations)
+    """
+    def get_variance(self):
+        if self.__count < 2:
+            return None
+        variance = (self.__total_squares - self.__total * self.__total / self.__count) / (self.__count - 1)
+        # rounding errors can make it slightly negative when every observation is the same
+        return max(variance, 0.0)